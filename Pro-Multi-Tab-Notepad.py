@@ -6,10 +6,10 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 import customtkinter as ctk
 from tkinter import messagebox
-import re
-import markdown2
 import tempfile
 import threading
+import queue
+import multiprocessing
 import requests
 import webbrowser
 from packaging import version
@@ -17,6 +17,10 @@ from packaging import version
 # Import from new modules
 from config import AppConfig, I18n, CTkToolTip
 from ui_components import EditorView, SyntaxHighlighter
+from preview import MarkdownRenderer, PreviewWorker, build_page, join_blocks
+from file_io import write_text_atomic
+from preview_server import PreviewServer
+from recovery import RECOVERY_DIR_NAME
 from mixins import (
     TabOperationsMixin,
     FileOperationsMixin,
@@ -24,16 +28,37 @@ from mixins import (
     SettingsOperationsMixin,
     MarkdownEditMixin,
     ImportOperationsMixin,
+    GlobalSearchMixin,
+    RecoveryMixin,
+    SessionMixin,
 )
 
 # ==========================================
 # 7. メインアプリケーション (MultiTabApp)
 # ==========================================
-class MultiTabApp(ctk.CTk, TabOperationsMixin, FileOperationsMixin, SearchOperationsMixin, SettingsOperationsMixin, ImportOperationsMixin, MarkdownEditMixin):
+class MultiTabApp(ctk.CTk, TabOperationsMixin, FileOperationsMixin, SearchOperationsMixin, GlobalSearchMixin, RecoveryMixin, SessionMixin, SettingsOperationsMixin, ImportOperationsMixin, MarkdownEditMixin):
+    # ワーカースレッドから頼まれた処理を UI スレッドで受け取りに行く間隔
+    UI_CALL_POLL_MS = 30
+
     def __init__(self):
         super().__init__()
         # --- 変数の初期化 ---
         self.preview_file = None 
+        # 最後に書き出したプレビューの (タブ, 版数, テーマ, Base, 間隔)。同じなら再生成しない
+        self._preview_key = None
+        self.markdown_renderer = MarkdownRenderer()
+        self._preview_pending_key = None
+        self._preview_generation = 0
+        # プレビューを開いたときに起動するローカルサーバー (ライブリロード用)
+        # アプリ内部のファイル (復旧ジャーナル・セッション・設定) は既定の保存先と同じフォルダにあるので配信させない
+        self.preview_server = PreviewServer(private_paths=[os.path.join(AppConfig.APP_DIR_PATH, name) for name in (
+            RECOVERY_DIR_NAME, self.SESSION_FILE, "settings.json", "settings.json.bak")])
+        # 書き込み中の保存 (書き終わると set される Event。終了時に書き終わるまで待つ) と、その結果
+        self._pending_saves = set()
+        self._save_results = queue.Queue()
+        self._save_poll_job = None
+        # ワーカースレッドから UI スレッドへ渡す処理 (Tk はワーカースレッドから呼ばない)
+        self._ui_calls = queue.Queue()
         
         self._ensure_app_directory()
         # 設定を読み込む（初回起動時またはバックアップから復元）
@@ -44,13 +69,19 @@ class MultiTabApp(ctk.CTk, TabOperationsMixin, FileOperationsMixin, SearchOperat
         self._create_widgets()
         self.init_markdown_toolbar()
         self.init_search_ui()
+        self.init_global_search()
         self.init_settings_ui()
         self._setup_bindings()
         self._check_empty_state()
         self.update_ui_texts()
+        # 未保存の編集の記録を始め、前回クラッシュしていれば復元を提案する
+        self.init_recovery()
+        # 前回開いていたタブを復元する (ファイルは各タブを初めて表示したときに読み込む)
+        self.restore_session()
         
         # 10秒ごとの自動プレビュー更新ループ開始
         self._setup_auto_preview()
+        self._poll_ui_calls()
         
         self.after(2000, self.check_for_updates)
         
@@ -62,12 +93,18 @@ class MultiTabApp(ctk.CTk, TabOperationsMixin, FileOperationsMixin, SearchOperat
         from tkinter import messagebox
         
         # 変更があるタブの確認
-        unsaved_tabs = [tab for tab in self.tabs.values() if tab["editor"].is_modified]
+        unsaved_tabs = [tab_id for tab_id in self.tab_order if self.tab_is_modified(tab_id)]
         if unsaved_tabs:
             msg = f"{len(unsaved_tabs)}個のタブに未保存の変更があります。\n保存せずに終了しますか？"
             if not messagebox.askyesno("確認", msg):
                 return
         
+        self.preview_server.stop()
+        self.wait_for_saves()
+        self.save_session()
+        # 正常に終了するので復旧用のジャーナルは不要
+        self.close_journal()
+
         # 設定を保存
         AppConfig.save_settings()
         print("設定を保存しました。アプリを終了します。")
@@ -180,6 +217,8 @@ class MultiTabApp(ctk.CTk, TabOperationsMixin, FileOperationsMixin, SearchOperat
         self.bind_all("<Control-s>", lambda e: self.save_file() or "break")
         self.bind_all("<Control-Shift-S>", lambda e: self.save_file_as() or "break")
         self.bind_all("<Control-f>", self.toggle_search)
+        self.bind_all("<Control-Shift-F>", lambda e: self.find_in_folder() or "break")
+        self.bind_all("<Control-Shift-f>", lambda e: self.find_in_folder() or "break")
         self.bind_all("<Control-comma>", lambda e: self.toggle_settings())
         # ショートカットキーを修正
         self.bind_all("<Control-Shift-P>", lambda e: self.preview_markdown() or "break")
@@ -195,23 +234,23 @@ class MultiTabApp(ctk.CTk, TabOperationsMixin, FileOperationsMixin, SearchOperat
         new_state = not AppConfig.settings["show_line_numbers"]
         AppConfig.settings["show_line_numbers"] = new_state
         self.line_num_var.set(new_state)
-        for tab in self.tabs.values():
-            tab["editor"].toggle_line_numbers(new_state)
+        for editor in self.live_editors():
+            editor.toggle_line_numbers(new_state)
 
     def toggle_grid_global(self):
         new_state = not AppConfig.settings["show_grid"]
         AppConfig.settings["show_grid"] = new_state
         self.grid_var.set(new_state)
-        for tab in self.tabs.values():
-            tab["editor"].update_line_numbers()
-            tab["editor"].highlight_current_line()
+        for editor in self.live_editors():
+            editor.update_line_numbers()
+            editor.highlight_current_line()
 
     def toggle_current_line_global(self):
         new_state = not AppConfig.settings["show_current_line"]
         AppConfig.settings["show_current_line"] = new_state
         self.cur_line_var.set(new_state)
-        for tab in self.tabs.values():
-            tab["editor"].highlight_current_line()
+        for editor in self.live_editors():
+            editor.highlight_current_line()
     
     def redo_action(self):
         """現在アクティブなタブのエディタでやり直し(Redo)を実行する"""
@@ -240,11 +279,32 @@ class MultiTabApp(ctk.CTk, TabOperationsMixin, FileOperationsMixin, SearchOperat
             self.status_label_right.configure(text="")
             return
             
-        editor = self.tabs[self.current_tab_id]["editor"]
+        tab = self.tabs[self.current_tab_id]
+        editor = tab["editor"]
         mod = AppConfig.t("modified") if editor.is_modified else ""
-        self.status_label_left.configure(text=f"{editor.file_path or AppConfig.t('untitled')}{mod}")
+        if "loader" in tab:
+            self.status_label_left.configure(text=AppConfig.t("loading_file", path=editor.file_path, percent=tab["loader"].progress))
+        elif "large_file" in tab:
+            self.status_label_left.configure(text=AppConfig.t("large_file_status", path=editor.file_path))
+        elif "saving" in tab:
+            self.status_label_left.configure(text=AppConfig.t("saving_file", path=editor.file_path or AppConfig.t("untitled")))
+        else:
+            self.status_label_left.configure(text=f"{editor.file_path or AppConfig.t('untitled')}{mod}")
         line, col = editor.textbox.index("insert").split(".")
-        self.status_label_right.configure(text=AppConfig.t("line_col", line=line, col=col, chars=len(editor.get("1.0", "end-1c")), mode=editor.mode))
+        # プレビュー中の文書ならプレビューをカーソル位置に追従させる
+        if self.preview_server.running and self._preview_key and self._preview_key[0] == self.current_tab_id:
+            self.preview_server.set_caret(int(line))
+        if "large_file" in tab:
+            # 巨大ファイルビューではエディタにはファイルの一部しかないので、行番号と統計はファイル全体で示す
+            document = tab["large_file"].document
+            self.status_label_right.configure(text=AppConfig.t(
+                "large_file_info", line=int(line) + editor.line_offset, col=col, lines=f"{document.line_count:,}",
+                size=document.size // (1024 * 1024), mode=editor.mode))
+            return
+        # 文字数は編集差分で更新済みの統計を使う（バッファ全体をコピーしない）
+        selected = editor.selection_length()
+        sel_text = AppConfig.t("selection", count=selected) if selected else ""
+        self.status_label_right.configure(text=sel_text + AppConfig.t("line_col", line=line, col=col, chars=editor.stats.chars, words=editor.stats.words, mode=editor.mode))
 
     def _check_empty_state(self):
         if self.settings_visible: return
@@ -304,114 +364,111 @@ class MultiTabApp(ctk.CTk, TabOperationsMixin, FileOperationsMixin, SearchOperat
                 # 存在しないファイルは履歴から削除
                 AppConfig.settings["recent_files"].remove(file_path)
     
+    def call_in_ui(self, func, *args):
+        """ワーカースレッドから呼ぶ。func(*args) を UI スレッドで実行させる"""
+        self._ui_calls.put((func, args))
+
+    def _poll_ui_calls(self):
+        """call_in_ui で頼まれた処理を UI スレッドで実行する"""
+        while True:
+            try:
+                func, args = self._ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"UI 更新エラー: {e}")
+        self.after(self.UI_CALL_POLL_MS, self._poll_ui_calls)
+
     def _setup_auto_preview(self):
-        """バックグラウンドでHTMLファイルを更新し続ける"""
-        self.save_preview_html()
+        """バックグラウンドでHTMLファイルを更新し続ける（一度もプレビューを開いていなければ何もしない）"""
+        if self.preview_file is not None or self.preview_server.running:
+            self.save_preview_html()
         interval_ms = AppConfig.settings.get("preview_interval", 5) * 1000
         self.after(interval_ms, self._setup_auto_preview)
     
-    def save_preview_html(self):
-        """現在の内容を一時ファイルに上書き保存する（ブラウザは開かない）"""
+    def save_preview_html(self, on_done=None):
+        """現在の内容をプレビューとして書き出す（ブラウザは開かない）
+
+        プレビューサーバーが動いていればサーバーに公開し、そうでなければ一時ファイルに書き出す。
+        UI スレッドではテキストの取得だけを行い、変換と書き込みはワーカーで行う。
+        書き込みが終わると on_done(表示先) が UI スレッドで呼ばれる。
+        """
         if not self.current_tab_id or self.current_tab_id not in self.tabs:
             return None
         
         tab = self.tabs[self.current_tab_id]
         editor = tab["editor"]
-        content = editor.get("1.0", "end-1c")
         
-        base_tag = ""
+        base_dir, base_tag = None, ""
         if editor.file_path:
             # ファイルが存在するディレクトリをBaseにすることで assets/image.png が読み込める
-            file_dir = os.path.abspath(os.path.dirname(editor.file_path)).replace("\\", "/")
+            base_dir = os.path.abspath(os.path.dirname(editor.file_path))
+            file_dir = base_dir.replace("\\", "/")
             base_tag = f'<base href="file:///{file_dir}/">'
-        
-        # --- 数式・化学式保護ロジック ---
-        math_blocks = []
-        def save_math(match):
-            placeholder = f"@@MATH{len(math_blocks)}@@"
-            math_blocks.append(match.group(0))
-            return placeholder
-
-        # 正規表現：$$, $, \begin{}, \ce{} を保護
-        pattern = r'(\$\$.*?\$\$|\\begin\{.*?\}.*?\\end\{.*?\}|\\ce\{.*?\}|\$.*?\$)'
-        content_protected = re.sub(pattern, save_math, content, flags=re.DOTALL)
-        
-        # 変数名を html_body に統一
-        html_body = markdown2.markdown(content_protected, extras=["fenced-code-blocks", "tables", "task_lists"])
 
-        # 保護していた数式を復元
-        for i, block in enumerate(math_blocks):
-            html_body = html_body.replace(f"@@MATH{i}@@", block)
+        use_server = self.preview_server.running
+        if not use_server and self.preview_file is None:
+            temp = tempfile.NamedTemporaryFile(delete=False, suffix=".html", mode="w", encoding="utf-8")
+            self.preview_file = temp
+            temp.close()
+        target = self.preview_server.url if use_server else self.preview_file.name
 
-        # UI設定に基づいた配色
+        # 内容・テーマ・Base・表示先が前回の書き出し (または書き出し待ち) から変わっていなければ何もしない
+        # (版はエディタを作り直すと数え直すので、エディタも区別する)
         is_dark = ctk.get_appearance_mode() == "Dark"
-        bg_color = "#1a1a1a" if is_dark else "white"
-        text_color = "#e0e0e0" if is_dark else "black"
-        border_color = "#444" if is_dark else "#ccc"
-        header_bg = "#333" if is_dark else "#f5f5f5"
-        
         interval_sec = AppConfig.settings.get("preview_interval", 5)
+        preview_key = (self.current_tab_id, id(editor), editor.version, is_dark, base_tag, interval_sec, target)
+        if preview_key == self._preview_key:
+            if on_done: on_done(target)
+            return target
+        if preview_key == self._preview_pending_key and on_done is None:
+            return target
+        content = editor.get("1.0", "end-1c")
 
-        full_html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            {base_tag}
-            <script>
-                // ブラウザ側のリロード間隔も設定値に同期
-                setInterval(() => {{ location.reload(); }}, {interval_sec * 1000});
-                
-                // スクロール位置の維持ロジック (UX向上)
-                window.onbeforeunload = function() {{ localStorage.setItem('scrollPos', window.scrollY); }};
-                window.onload = function() {{
-                    if (localStorage.getItem('scrollPos')) 
-                        window.scrollTo(0, parseInt(localStorage.getItem('scrollPos')));
-                }};
-                
-                window.MathJax = {{
-                  tex: {{
-                    inlineMath: [['$', '$'], ['\\\\(', '\\\\)']],
-                    displayMath: [['$$', '$$'], ['\\\\[', '\\\\]']],
-                    processEscapes: true
-                  }},
-                  loader: {{ load: ['[tex]/mhchem'] }}
-                }};
-            </script>
-            <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js"></script>
-            <style>
-                body {{ background-color: {bg_color}; color: {text_color}; font-family: sans-serif; line-height: 1.7; max-width: 850px; margin: 0 auto; padding: 40px; }}
-                h1 {{ border-bottom: 2px solid #569CD6; padding-bottom: 10px; }}
-                pre {{ background: #2b2b2b; color: #f8f8f2; padding: 15px; border-radius: 8px; overflow-x: auto; }}
-                table {{ border-collapse: collapse; width: 100%; margin: 20px 0; border: 1px solid {border_color}; }}
-                th, td {{ border: 1px solid {border_color}; padding: 12px; text-align: left; }}
-                th {{ background-color: {header_bg}; font-weight: bold; }}
-                tr:nth-child(even) {{ background-color: rgba(128,128,128,0.05); }}
-                img {{ max-width: 100%; height: auto; border-radius: 4px; }}
-                .MathJax {{ font-size: 1.1em !important; }}
-            </style>
-        </head>
-        <body>{html_body}</body>
-        </html>
-        """
-        
-        if self.preview_file is None:
-            temp = tempfile.NamedTemporaryFile(delete=False, suffix=".html", mode="w", encoding="utf-8")
-            self.preview_file = temp
-            temp.close()
-        
-        try:
-            with open(self.preview_file.name, "w", encoding="utf-8") as f:
-                f.write(full_html)
-            return self.preview_file.name
-        except:
-            return None
+        self._preview_generation += 1
+        generation = self._preview_generation
+        self._preview_pending_key = preview_key
+
+        def job():
+            # 後から新しいスナップショットが積まれていれば、この結果は捨てる
+            if generation != self._preview_generation: return
+            blocks = self.markdown_renderer.render_blocks(content)
+            html_body = join_blocks(blocks)
+            if generation != self._preview_generation: return
+            try:
+                if use_server:
+                    # サーバー経由では相対パスをサーバーがノートのフォルダから配信する (<base> はサーバーが決める)
+                    self.preview_server.publish(lambda version, server_base: build_page(html_body, server_base, is_dark, interval_sec, version),
+                                                blocks, base_dir, shell_key=is_dark, root_dir=AppConfig.settings["default_dir"])
+                else:
+                    write_text_atomic(target, build_page(html_body, base_tag, is_dark, interval_sec), overwrite_fallback=True)
+            except Exception as e:
+                print(f"プレビュー書き込みエラー: {e}")
+                return
+            self.call_in_ui(self._on_preview_written, preview_key, target, on_done)
+
+        PreviewWorker.submit(job)
+        return target
+
+    def _on_preview_written(self, preview_key, target, on_done):
+        self._preview_key = preview_key
+        if self._preview_pending_key == preview_key: self._preview_pending_key = None
+        if on_done: on_done(target)
     
     def preview_markdown(self):
         """手動でプレビューをブラウザに表示する"""
-        path = self.save_preview_html()
-        if path:
-            webbrowser.open(f"file://{path}")
+        if AppConfig.settings.get("preview_server", True):
+            try:
+                self.preview_server.start()
+            except OSError as e:
+                # サーバーを起動できなければ従来の一時ファイル方式で表示する
+                print(f"プレビューサーバー起動エラー: {e}")
+        self.save_preview_html(on_done=self._open_preview)
+
+    def _open_preview(self, target):
+        webbrowser.open(target if self.preview_server.running else f"file://{target}")
 
     def _setup_window(self):
         # タイトルにバージョンを表示
@@ -435,7 +492,7 @@ class MultiTabApp(ctk.CTk, TabOperationsMixin, FileOperationsMixin, SearchOperat
                     print(f"Latest version on GitHub: {latest_version_str}")
                     
                     if version.parse(latest_version_str) > version.parse(AppConfig.APP_VERSION):
-                        self.after(0, lambda: self._show_update_dialog(latest_version_str, data["html_url"]))
+                        self.call_in_ui(self._show_update_dialog, latest_version_str, data["html_url"])
                     else:
                         print("No update available.")
             except Exception as e:
@@ -452,15 +509,17 @@ class MultiTabApp(ctk.CTk, TabOperationsMixin, FileOperationsMixin, SearchOperat
             webbrowser.open(download_url)
 
 if __name__ == "__main__":
+    # フォルダ内検索のプロセスプールが、exe 化した環境でもアプリ本体を再起動しないようにする
+    multiprocessing.freeze_support()
     try:
         app = MultiTabApp()
         
         # 起動時引数として渡されたファイルを開く
         if len(sys.argv) > 1:
-            for file_path in sys.argv[1:]:
-                if os.path.isfile(file_path):
-                    # GUIが完全に初期化された後に開く
-                    app.after(100, lambda fp=file_path: app.open_file_by_path(fp))
+            file_paths = [file_path for file_path in sys.argv[1:] if os.path.isfile(file_path)]
+            for i, file_path in enumerate(file_paths):
+                # GUIが完全に初期化された後に開く (最後のファイル以外は、タブを表示したときに読み込む)
+                app.after(100, lambda fp=file_path, bg=i < len(file_paths) - 1: app.open_file_by_path(fp, background=bg))
         
         app.mainloop()
     except KeyboardInterrupt:
@@ -0,0 +1,102 @@
+"""シンタックスハイライトのベンチマーク
+
+旧方式 (規則ごとにバッファ全体を re.finditer し、"1.0+Nc" で1件ずつ tag_add) と
+現方式 (文法ごとの結合パターンで1回走査し、行頭オフセット表で 行.列 に変換してタグごとにまとめて tag_add) を比較する。
+
+    python benchmarks/bench_highlight.py [行数]
+
+Tk の表示環境がない場合、タグ適用の計測は省略される。
+"""
+import os
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from syntax import get_grammar
+from ui_components import SyntaxHighlighter
+
+# 旧 SyntaxHighlighter.apply の Python 用規則
+LEGACY_RULES = [
+    ("keyword", r"\b(def|class|if|else|elif|for|while|return|import|from|as|try|except|with|None|True|False|self|in|is|not|pass|lambda)\b"),
+    ("string", r"(\".*?\"|'.*?')"),
+    ("comment", r"#.*"),
+    ("number", r"\b\d+\b"),
+]
+
+
+def make_source(line_count):
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ui_components.py")
+    with open(path, "r", encoding="utf-8") as f:
+        base = f.read().splitlines()
+    lines = (base * (line_count // len(base) + 1))[:line_count]
+    return "\n".join(lines)
+
+
+def legacy_tokenize(content):
+    spans = []
+    for tag, pattern in LEGACY_RULES:
+        for match in re.finditer(pattern, content):
+            spans.append((tag, match.start(), match.end()))
+    return spans
+
+
+def grammar_tokenize(content):
+    return get_grammar("Python").tokenize(content)[0]
+
+
+def timed(fn, *args, repeat=1):
+    """repeat 回実行して最短の時間と結果を返す (実行ごとのばらつきを除く)"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best: best = elapsed
+    return best, result
+
+
+def bench_tag_apply(content, legacy_spans, line_spans):
+    try:
+        import tkinter
+        root = tkinter.Tk()
+    except Exception as e:
+        print(f"タグ適用: Tk を初期化できないため省略 ({e})")
+        return
+    root.withdraw()
+    text = tkinter.Text(root)
+    text.insert("1.0", content)
+
+    def legacy():
+        for tag, s, e in legacy_spans:
+            text.tag_add(tag, f"1.0+{s}c", f"1.0+{e}c")
+
+    def batched():
+        SyntaxHighlighter._apply_spans(SimpleNamespace(textbox=SimpleNamespace(_textbox=text)), 1, line_spans)
+
+    old, _ = timed(legacy)
+    for tag in ("keyword", "string", "comment", "number"):
+        text.tag_remove(tag, "1.0", "end")
+    new, _ = timed(batched)
+    root.destroy()
+    print(f"タグ適用   旧: {old * 1000:9.1f} ms ({len(legacy_spans)} 回の tag_add)")
+    print(f"タグ適用   新: {new * 1000:9.1f} ms (タグごとに1回)  {old / new:6.1f} 倍")
+
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    content = make_source(line_count)
+    print(f"{line_count} 行 / {len(content)} 文字")
+
+    old, legacy_spans = timed(legacy_tokenize, content, repeat=5)
+    new, line_spans = timed(grammar_tokenize, content, repeat=5)
+    print(f"トークン化 旧: {old * 1000:9.1f} ms (5回の最短)")
+    print(f"トークン化 新: {new * 1000:9.1f} ms (5回の最短)  {old / new:6.2f} 倍")
+
+    bench_tag_apply(content, legacy_spans, line_spans)
+
+
+if __name__ == "__main__":
+    main()
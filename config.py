@@ -12,6 +12,23 @@ class I18n:
             "open_file": "開く",
             "save_file": "保存",
             "find": "検索",
+            "search_case": "大文字と小文字を区別",
+            "search_whole_word": "単語単位で検索",
+            "search_regex": "正規表現",
+            "search_count": "{n} / {total} 件",
+            "search_no_results": "一致なし",
+            "search_at_line": "{line} 行目",
+            "search_invalid": "不正な正規表現",
+            "search_all_tabs": "開いている全タブを検索",
+            "results_in_tabs": "全タブの検索結果: {query}",
+            "find_in_folder": "既定フォルダ内を検索",
+            "replace": "置換",
+            "replace_all": "すべて置換",
+            "replaced_count": "{count} 件置換",
+            "results_in_folder": "フォルダ内の検索結果: {query} ({folder})",
+            "results_searching": "検索中... {count} 件",
+            "results_done": "{count} 件",
+            "results_truncated": "{count} 件 (上限に達したため打ち切り)",
             "settings": "設定",
             "untitled": "無題",
             "welcome_title": "Pro Multi-Tab Notepad",
@@ -19,7 +36,18 @@ class I18n:
             "ready": "準備完了",
             "no_file": "ファイルなし",
             "modified": " (変更あり)",
-            "line_col": "行 {line}, 列 {col} | 文字数: {chars} | モード: {mode}",
+            "loading_file": "読み込み中: {path} ({percent}%)",
+            "saving_file": "保存中: {path}",
+            "partial_file_no_save": "このタブはファイルを最後まで読み込めなかったため、保存できません。",
+            "recovery_failed": "次のタブの未保存の編集は、元のファイルが記録の開始後に変更されたなどの理由で復元できませんでした。\n{names}\n\n記録は削除せずに次のフォルダに残しています。\n{folders}",
+            "recovery_title": "未保存の変更の復元",
+            "recovery_prompt": "前回の終了時に保存されていなかった {count} 個のタブが見つかりました。\n\n{names}\n\n復元しますか？ ([いいえ] を選ぶと破棄します)",
+            "large_file_status": "{path} (読み取り専用)",
+            "large_file_info": "行 {line}, 列 {col} | 全 {lines} 行 | {size} MB | モード: {mode}",
+            "large_file_title": "大容量ファイル",
+            "large_file_prompt": "「{name}」は {size} MB あります。\n読み取り専用の大容量ファイルビューで開きますか？\n\n[いいえ]: 通常どおり編集用に読み込む",
+            "line_col": "行 {line}, 列 {col} | 文字数: {chars} | 単語数: {words} | モード: {mode}",
+            "selection": "選択: {count} 文字 | ",
             "settings_title": "設定",
             "appearance": "外観",
             "theme_mode": "テーマモード (Light/Dark)",
@@ -43,6 +71,9 @@ class I18n:
             "markdown_preview": "Markdownプレビュー (ブラウザ)",
             "preview_settings": "プレビュー設定",
             "preview_interval": "自動更新の間隔 (秒)",
+            "preview_server": "ローカルサーバーでライブ更新",
+            "max_live_tabs": "エディタを保持するタブの上限",
+            "max_live_text_mb": "エディタに保持する文字数の上限 (MB)",
             "import_file": "ファイルをインポート (docx/html)",
             "conversion_error": "変換エラーが発生しました: {error}",
             "export_settings": "設定をエクスポート",
@@ -60,6 +91,23 @@ class I18n:
             "open_file": "Open",
             "save_file": "Save",
             "find": "Find",
+            "search_case": "Match case",
+            "search_whole_word": "Whole word",
+            "search_regex": "Regular expression",
+            "search_count": "{n} of {total}",
+            "search_no_results": "No results",
+            "search_at_line": "Line {line}",
+            "search_invalid": "Invalid regex",
+            "search_all_tabs": "Search all open tabs",
+            "results_in_tabs": "Results in open tabs: {query}",
+            "find_in_folder": "Find in default folder",
+            "replace": "Replace",
+            "replace_all": "Replace All",
+            "replaced_count": "Replaced {count}",
+            "results_in_folder": "Results in folder: {query} ({folder})",
+            "results_searching": "Searching... {count} found",
+            "results_done": "{count} found",
+            "results_truncated": "{count} found (limit reached)",
             "settings": "Settings",
             "untitled": "Untitled",
             "welcome_title": "Pro Multi-Tab Notepad",
@@ -67,7 +115,18 @@ class I18n:
             "ready": "Ready",
             "no_file": "No file open",
             "modified": " (Modified)",
-            "line_col": "Line {line}, Col {col} | Chars: {chars} | Mode: {mode}",
+            "loading_file": "Loading: {path} ({percent}%)",
+            "saving_file": "Saving: {path}",
+            "partial_file_no_save": "This tab could not read the whole file, so it cannot be saved.",
+            "recovery_failed": "Unsaved edits in these tabs could not be restored (for example, the original file changed after recording began):\n{names}\n\nThe journals were not deleted and are kept in:\n{folders}",
+            "recovery_title": "Recover Unsaved Changes",
+            "recovery_prompt": "Found {count} tab(s) with changes that were not saved last time.\n\n{names}\n\nRestore them? (Choose No to discard them)",
+            "large_file_status": "{path} (Read-only)",
+            "large_file_info": "Line {line}, Col {col} | {lines} lines | {size} MB | Mode: {mode}",
+            "large_file_title": "Large File",
+            "large_file_prompt": "\"{name}\" is {size} MB.\nOpen it in the read-only large file view?\n\n[No]: Load it normally for editing",
+            "line_col": "Line {line}, Col {col} | Chars: {chars} | Words: {words} | Mode: {mode}",
+            "selection": "Selected: {count} | ",
             "settings_title": "Settings",
             "appearance": "Appearance",
             "theme_mode": "Theme Mode (Light/Dark)",
@@ -91,6 +150,9 @@ class I18n:
             "markdown_preview": "Markdown Preview (Browser)",
             "preview_settings": "Preview Settings",
             "preview_interval": "Update Interval (sec)",
+            "preview_server": "Live reload via local server",
+            "max_live_tabs": "Max tabs kept in memory",
+            "max_live_text_mb": "Max text kept in memory (MB)",
             "import_file": "Import File (docx/html)",
             "conversion_error": "Conversion error: {error}",
             "export_settings": "Export Settings",
@@ -131,6 +193,9 @@ class AppConfig:
         "show_current_line": True,
         "default_dir": APP_DIR_PATH, # 専用ディレクトリを初期値に設定
         "preview_interval": 5,
+        "preview_server": True,  # プレビューをローカルサーバーで配信し、更新時だけ再読み込みする
+        "max_live_tabs": 20,  # エディタを作ったまま保持するタブの上限 (超えたら長く表示していないタブを休止させる)
+        "max_live_text_mb": 64,  # エディタに保持する文字数の上限 (目安, MB)
         "lang": "ja",
         "last_save_dir": None,  # 最後に保存したディレクトリ
         "recent_files": [],  # 最近開いたファイルのリスト（最大10件）
@@ -261,6 +326,9 @@ class AppConfig:
                     "show_current_line": True,
                     "default_dir": cls.APP_DIR_PATH,
                     "preview_interval": 5,
+                    "preview_server": True,
+                    "max_live_tabs": 20,
+                    "max_live_text_mb": 64,
                     "lang": "ja",
                     "last_save_dir": None,
                     "recent_files": [],
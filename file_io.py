@@ -0,0 +1,231 @@
+import codecs
+import os
+import queue
+import stat
+import tempfile
+import threading
+import time
+
+# ==========================================
+# ファイル入出力ユーティリティ
+# ==========================================
+def _current_umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+# 新しく作るファイルの権限 (mkstemp は所有者だけが読み書きできる 0600 で作るため、通常のファイルと同じにそろえる)
+_NEW_FILE_MODE = 0o666 & ~_current_umask()
+# 置き換えが PermissionError になったときに再試行する回数と間隔 (秒)
+REPLACE_RETRIES = 10
+REPLACE_RETRY_DELAY = 0.1
+
+
+def write_text_atomic(path, text, encoding="utf-8", newline=None, fsync=False, overwrite_fallback=False):
+    """同じフォルダの一時ファイルに書いてから置き換える
+
+    読み手 (ブラウザ等) が書きかけのファイルを読むことがなく、途中で失敗しても元のファイルは残る。
+    既存のファイルを置き換えるときは、その権限を引き継ぐ。シンボリックリンクはリンク先を置き換える。
+    Windows で相手 (ウイルス対策・同期ソフト等) がファイルを開いていて置き換えられないときは
+    少し待って再試行し、それでも駄目なら PermissionError を送出する。overwrite_fallback なら
+    代わりに直接上書きする (途中で落ちると中身が壊れうるので、作り直せるプレビュー用のファイルに限る)。
+    """
+    path = os.path.realpath(path)
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding=encoding, newline=newline) as f:
+            f.write(text)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except OSError:
+            mode = _NEW_FILE_MODE
+        try:
+            os.chmod(temp_path, mode)
+        except OSError:
+            pass
+        for attempt in range(REPLACE_RETRIES):
+            try:
+                os.replace(temp_path, path)
+                return
+            except PermissionError:
+                if overwrite_fallback: break
+                if attempt == REPLACE_RETRIES - 1: raise
+                time.sleep(REPLACE_RETRY_DELAY)
+        # 置き換えられなかったので直接上書きする (overwrite_fallback のときだけ)
+        with open(path, "w", encoding=encoding, newline=newline) as f:
+            f.write(text)
+        os.remove(temp_path)
+    except BaseException:
+        if os.path.exists(temp_path): os.remove(temp_path)
+        raise
+
+
+# 1回に読み込むバイト数
+CHUNK_SIZE = 256 * 1024
+# エンコーディング判定に使う先頭部分の大きさ
+SNIFF_SIZE = 64 * 1024
+# ワーカーが先読みしておくチャンク数の上限 (メモリを使いすぎないように)
+MAX_PENDING_CHUNKS = 8
+
+_BOMS = (
+    # UTF-32 LE の BOM は UTF-16 LE の BOM で始まるので先に調べる
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# BOM がなく UTF-8 として読めない場合に試すエンコーディング
+FALLBACK_ENCODINGS = ("cp932",)
+
+
+def detect_encoding(head):
+    """先頭のバイト列から BOM とエンコーディングを推定する"""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom): return encoding
+    for encoding in ("utf-8",) + FALLBACK_ENCODINGS:
+        try:
+            # 末尾で途切れた多バイト文字はエラーにしない
+            codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+
+def candidate_encodings(head):
+    """ファイル全体を厳密にデコードするときに試すエンコーディングを、先頭から推定した順に返す
+
+    先頭だけでは判定を誤ることがある (先頭が ASCII だけの cp932 のファイルなど) ので、
+    読めなければ次を試す。BOM があればそのエンコーディングだけ。latin-1 はどのバイト列でも読める。
+    """
+    for bom, encoding in _BOMS:
+        if head.startswith(bom): return [encoding]
+    detected = detect_encoding(head)
+    return [detected] + [e for e in ("utf-8",) + FALLBACK_ENCODINGS + ("latin-1",) if e != detected]
+
+
+class NewlineNormalizer:
+    """改行を \\n にそろえつつ、最初に見つかった改行の種類 (style) を覚えておく
+
+    チャンクの境目で \\r\\n が分かれても正しく扱えるよう、末尾の \\r は次のチャンクまで持ち越す。
+    """
+    def __init__(self):
+        self.style = None
+        self._pending_cr = False
+
+    def feed(self, text, final=False):
+        if self._pending_cr:
+            text = "\r" + text
+            self._pending_cr = False
+        if not final and text.endswith("\r"):
+            text = text[:-1]
+            self._pending_cr = True
+        if self.style is None:
+            cr, lf = text.find("\r"), text.find("\n")
+            if cr >= 0 and (lf < 0 or cr < lf):
+                self.style = "\r\n" if text.startswith("\n", cr + 1) else "\r"
+            elif lf >= 0:
+                self.style = "\n"
+        if "\r" not in text: return text
+        return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def read_text(path):
+    """ファイル全体を読み込み (文字列, エンコーディング, 改行の種類) を返す。改行は \\n にそろえる"""
+    with open(path, "rb") as f:
+        data = f.read()
+    # 置換文字に化けた内容をそのまま保存しないよう、全体を厳密にデコードできるエンコーディングを使う
+    for encoding in candidate_encodings(data[:SNIFF_SIZE]):
+        try:
+            text = data.decode(encoding)
+            break
+        except UnicodeDecodeError as e:
+            error = e
+    else:
+        raise error
+    normalizer = NewlineNormalizer()
+    text = normalizer.feed(text, final=True)
+    return text, encoding, normalizer.style
+
+
+class ChunkedFileLoader:
+    """ファイルをワーカースレッドでチャンクごとに読み込み、デコード済みの文字列を chunks に順に積む
+
+    読み終わると chunks に None が積まれる。encoding と newline は読み込み中に確定する。
+    途中でデコードできなくなったら RESTART を積み、次のエンコーディングで先頭から読み直す
+    (受け手はそれまでに受け取った内容を捨てる)。
+    """
+    RESTART = object()
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.size = os.path.getsize(path)
+        self.bytes_read = 0
+        self.encoding = None
+        self.newline = None
+        self.error = None
+        self.chunks = queue.Queue(maxsize=MAX_PENDING_CHUNKS)
+        self._cancel = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def progress(self):
+        return 100 if not self.size else min(100, self.bytes_read * 100 // self.size)
+
+    def _put(self, item):
+        # 受け手がいなくなっても止まれるよう、待ちながら中止を確認する
+        while not self._cancel.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            with open(self.path, "rb") as f:
+                # エンコーディング判定に足りるよう、最初だけは判定に使う大きさ以上を読む
+                head = f.read(max(self.chunk_size, SNIFF_SIZE))
+                candidates = candidate_encodings(head[:SNIFF_SIZE])
+                for i, encoding in enumerate(candidates):
+                    try:
+                        if self._read(f, head, encoding) is False: return
+                        break
+                    except UnicodeDecodeError:
+                        if i == len(candidates) - 1: raise
+                        if not self._put(self.RESTART): return
+                        f.seek(len(head))
+        except Exception as e:
+            self.error = e
+        finally:
+            self._put(None)
+
+    def _read(self, f, data, encoding):
+        """encoding で厳密にデコードしながら読む。中止されたら False"""
+        self.encoding = encoding
+        self.bytes_read = 0
+        decoder = codecs.getincrementaldecoder(encoding)()
+        normalizer = NewlineNormalizer()
+        while data:
+            if self._cancel.is_set(): return False
+            self.bytes_read += len(data)
+            text = normalizer.feed(decoder.decode(data))
+            if text and not self._put(text): return False
+            data = f.read(self.chunk_size)
+        text = normalizer.feed(decoder.decode(b"", final=True), final=True)
+        if text and not self._put(text): return False
+        self.newline = normalizer.style
+        return True
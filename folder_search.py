@@ -0,0 +1,98 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from search_engine import compile_query, iter_line_matches
+
+# ==========================================
+# フォルダ内検索 (プロセスプールで並列に走査)
+# ==========================================
+# この大きさを超えるファイルは一度に読み込まず、行単位で少しずつ読む
+CHUNKED_READ_SIZE = 4 * 1024 * 1024
+# バイナリ判定に使う先頭部分の大きさ
+SNIFF_SIZE = 8192
+# 1ファイルあたりの一致の上限 (巨大なログ等で結果が溢れないように)
+MAX_MATCHES_PER_FILE = 1000
+# 1回のタスクでワーカーに渡すファイル数 (プロセス間通信の回数を減らす)
+FILES_PER_TASK = 32
+# 一致行として返す文字列の最大長
+LINE_WIDTH = 200
+
+
+def iter_files(root):
+    """root 以下のファイルを列挙する。隠しフォルダ (.git など) は辿らない"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for name in filenames:
+            yield os.path.join(dirpath, name)
+
+
+def is_binary(path):
+    try:
+        with open(path, "rb") as f:
+            return b"\0" in f.read(SNIFF_SIZE)
+    except OSError:
+        return True
+
+
+def search_file(path, pattern):
+    """1ファイルを検索し [(path, 行, 列, 終了列, 行の文字列), ...] を返す"""
+    if is_binary(path): return []
+    results = []
+    try:
+        if os.path.getsize(path) <= CHUNKED_READ_SIZE:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                text = f.read()
+            for line, col, end_line, end_col, line_text in iter_line_matches(pattern, text):
+                # 複数行にまたがる一致は開始行の末尾までを示す
+                if end_line != line: end_col = len(line_text)
+                results.append((path, line, col, end_col, line_text[:LINE_WIDTH]))
+                if len(results) >= MAX_MATCHES_PER_FILE: break
+        else:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                for line, text in enumerate(f, 1):
+                    text = text.rstrip("\r\n")
+                    for match in pattern.finditer(text):
+                        if match.start() == match.end(): continue
+                        results.append((path, line, match.start(), match.end(), text[:LINE_WIDTH]))
+                    if len(results) >= MAX_MATCHES_PER_FILE: break
+    except OSError:
+        return []
+    return results[:MAX_MATCHES_PER_FILE]
+
+
+def search_files(paths, query, regex=False, whole_word=False, case_sensitive=False):
+    """ワーカープロセスで実行されるタスク。複数ファイルをまとめて検索する"""
+    pattern = compile_query(query, regex, whole_word, case_sensitive)
+    results = []
+    for path in paths:
+        results.extend(search_file(path, pattern))
+    return results
+
+
+def search_folder(root, query, cancel, emit, regex=False, whole_word=False, case_sensitive=False, max_workers=None):
+    """root 以下をプロセスプールで並列に検索し、ファイル群ごとの結果を emit(results) に渡す
+
+    cancel (threading.Event) がセットされるか emit が False を返したら、未着手のタスクを捨てて終了する。
+    検索したファイル数を返す。
+    """
+    options = (query, regex, whole_word, case_sensitive)
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    scanned = 0
+    try:
+        futures, batch = {}, []
+        for path in iter_files(root):
+            if cancel.is_set(): return scanned
+            batch.append(path)
+            if len(batch) >= FILES_PER_TASK:
+                futures[executor.submit(search_files, batch, *options)] = len(batch)
+                batch = []
+        if batch: futures[executor.submit(search_files, batch, *options)] = len(batch)
+
+        for future in as_completed(futures):
+            if cancel.is_set(): return scanned
+            scanned += futures[future]
+            results = future.result()
+            if results and not emit(results): return scanned
+        return scanned
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
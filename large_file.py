@@ -0,0 +1,267 @@
+import mmap
+import re
+import threading
+from array import array
+from bisect import bisect_right
+
+from file_io import SNIFF_SIZE, detect_encoding
+
+# ==========================================
+# 巨大ファイル用の読み取り専用ビュー (mmap + 疎な行オフセット表)
+# ==========================================
+# 改行を 1 バイトの b"\n" で探せるエンコーディングだけを mmap で扱う
+MMAP_ENCODINGS = ("utf-8", "utf-8-sig", "cp932", "latin-1")
+
+
+class LargeFileDocument:
+    """mmap したファイルと、その疎な行オフセット表
+
+    表は BLOCK_SIZE バイトごと (行の区切りに合わせる) に「そこまでの改行数」と「オフセット」だけを持つので、
+    ファイルの大きさに関わらずメモリ使用量は小さい。表はバックグラウンドで作られる。
+    """
+    BLOCK_SIZE = 1024 * 1024
+    # 後方検索で一度に調べる範囲
+    SEARCH_BLOCK = 4 * 1024 * 1024
+    # 索引作成中に、索引の最後の位置から改行を数えて進む範囲の上限
+    WALK_LIMIT = 4 * 1024 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self.mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self.size = len(self.mm)
+        self.encoding = detect_encoding(self.mm[:SNIFF_SIZE])
+        self.bom = 3 if self.encoding == "utf-8-sig" else 0
+        # lines[i] は offsets[i] より前にある改行の数 (= offsets[i] から始まる行の番号, 0 始まり)
+        self.offsets = array("q", [self.bom])
+        self.lines = array("q", [0])
+        self.complete = self.size <= self.bom
+        self._cancel = threading.Event()
+
+    @staticmethod
+    def supports(encoding):
+        return encoding in MMAP_ENCODINGS
+
+    def start_indexing(self):
+        threading.Thread(target=self._build_index, daemon=True).start()
+
+    def close(self):
+        self._cancel.set()
+        try:
+            self.mm.close()
+        except BufferError:
+            # 索引作成中のスライスが残っていても、プロセス終了時には解放される
+            pass
+        self._file.close()
+
+    def _build_index(self):
+        mm, size = self.mm, self.size
+        pos, count = self.offsets[-1], self.lines[-1]
+        try:
+            while pos < size:
+                if self._cancel.is_set(): return
+                end = min(pos + self.BLOCK_SIZE, size)
+                if end < size:
+                    newline = mm.find(b"\n", end)
+                    end = size if newline < 0 else newline + 1
+                count += mm[pos:end].count(b"\n")
+                pos = end
+                if pos < size:
+                    # UI 側は len(lines) を見るので offsets を先に伸ばす
+                    self.offsets.append(pos)
+                    self.lines.append(count)
+            self.newline_count = count
+            self.complete = True
+        except ValueError:
+            # 索引作成中に閉じられた
+            pass
+
+    @property
+    def line_count(self):
+        """総行数 (索引作成中は推定値)。Tk と同じく、最後の改行の後ろも1行と数える"""
+        if self.complete:
+            return getattr(self, "newline_count", 0) + 1
+        n = len(self.lines) - 1
+        indexed = self.offsets[n] - self.bom
+        if indexed <= 0: return 1
+        return max(int(self.lines[n] * (self.size - self.bom) / indexed), self.lines[n]) + 1
+
+    def offset_of_line(self, line):
+        """line 行目 (0 始まり) の先頭のバイトオフセット。ファイルの外か、索引の作成中で遠すぎれば None
+
+        索引の最後の位置より後ろの行は、そこから WALK_LIMIT バイトまで改行をたどって探す。
+        """
+        n = len(self.lines)
+        i = bisect_right(self.lines, line, 0, n) - 1
+        pos = self.offsets[i]
+        limit = self.size if self.complete or i < n - 1 else min(self.size, pos + self.WALK_LIMIT)
+        for _ in range(line - self.lines[i]):
+            pos = self.mm.find(b"\n", pos, limit)
+            if pos < 0: return None
+            pos += 1
+        return pos
+
+    def line_of_offset(self, offset):
+        """オフセットを含む行の番号 (0 始まり)"""
+        i = bisect_right(self.offsets, offset, 0, len(self.lines)) - 1
+        return self.lines[i] + self.mm[self.offsets[i]:offset].count(b"\n")
+
+    def read_lines(self, start, count):
+        """start 行目から最大 count 行を文字列で返す (改行は \\n にそろえる)"""
+        begin = self.offset_of_line(start)
+        if begin is None: return ""
+        end = begin
+        for _ in range(count):
+            end = self.mm.find(b"\n", end)
+            if end < 0:
+                end = self.size
+                break
+            end += 1
+        data = self.mm[begin:end]
+        if data.endswith(b"\n"): data = data[:-2] if data.endswith(b"\r\n") else data[:-1]
+        return data.decode(self.encoding.replace("-sig", ""), errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+
+    def compile(self, query, regex=False, whole_word=False, case_sensitive=False):
+        """検索条件をバイト列用の正規表現にする。単純な文字列検索ならバイト列のまま返す (find の方が速い)"""
+        encoded = query.encode(self.encoding.replace("-sig", ""), errors="replace")
+        if not regex and not whole_word and case_sensitive: return encoded
+        pattern = encoded if regex else re.escape(encoded)
+        if whole_word:
+            pattern = rb"\b(?:" + pattern + rb")\b"
+        return re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+
+    def search(self, pattern, offset, forward=True):
+        """mmap を直接検索し、一致の (開始, 終了) オフセットを返す。末尾・先頭で折り返す"""
+        if isinstance(pattern, bytes):
+            if not pattern: return None
+            if forward:
+                start = self.mm.find(pattern, offset)
+                if start < 0: start = self.mm.find(pattern)
+            else:
+                start = self.mm.rfind(pattern, 0, offset)
+                if start < 0: start = self.mm.rfind(pattern)
+            return None if start < 0 else (start, start + len(pattern))
+        if forward:
+            match = pattern.search(self.mm, offset) or pattern.search(self.mm, 0)
+            return match.span() if match else None
+        for stop in (offset, self.size):
+            end = stop
+            while end > 0:
+                start = max(0, end - self.SEARCH_BLOCK)
+                last = None
+                for match in pattern.finditer(self.mm, start, end):
+                    if match.end() > match.start(): last = match
+                if last: return last.span()
+                end = start
+        return None
+
+    def position(self, offset):
+        """オフセット -> (行, 列)。列は文字数で数える"""
+        line_start = self.mm.rfind(b"\n", 0, offset) + 1
+        line_start = max(line_start, self.bom)
+        col = len(self.mm[line_start:offset].decode(self.encoding.replace("-sig", ""), errors="replace"))
+        return self.line_of_offset(offset), col
+
+
+class LargeFileView:
+    """EditorView に表示範囲の前後の行だけを流し込み、スクロールに合わせて入れ替える"""
+    WINDOW_LINES = 3000
+    MARGIN_LINES = 500
+    # 索引ができあがったかを確かめる間隔 (ミリ秒)
+    INDEX_POLL_MS = 200
+
+    def __init__(self, editor, document):
+        self.editor = editor
+        self.document = document
+        self.window_start = 0
+        self.window_lines = 0
+        self._loading = False
+        self._closed = False
+        editor.textbox._textbox.configure(undo=False)
+        # スクロールバーはウィンドウ内ではなくファイル全体での位置を表す
+        editor.yscroll_filter = self._to_file_fractions
+        editor.textbox._y_scrollbar.configure(command=self._on_scrollbar)
+
+    def load_window(self, start):
+        widget = self.editor.textbox._textbox
+        self._loading = True
+        try:
+            text = self.document.read_lines(start, self.WINDOW_LINES)
+            widget.configure(state="normal")
+            widget.delete("1.0", "end")
+            widget.insert("1.0", text)
+            widget.configure(state="disabled")
+            self.window_start = start
+            self.window_lines = text.count("\n") + 1
+            self.editor.line_offset = start
+            self.editor.reset_modified()
+        finally:
+            self._loading = False
+
+    def to_index(self, line, col=0):
+        """ファイル全体の行 (0 始まり) と列を、必要ならウィンドウを移動したうえで Tk のインデックスにする"""
+        if not (self.window_start <= line < self.window_start + self.window_lines):
+            self.load_window(max(0, line - self.WINDOW_LINES // 2))
+        return f"{line - self.window_start + 1}.{col}"
+
+    def show_line(self, line):
+        widget = self.editor.textbox._textbox
+        index = self.to_index(line)
+        widget.yview(index)
+        widget.mark_set("insert", index)
+
+    def insert_offset(self):
+        """挿入カーソルのファイル内バイトオフセット"""
+        widget = self.editor.textbox._textbox
+        line = int(widget.index("insert").split(".")[0])
+        start = self.document.offset_of_line(self.window_start + line - 1)
+        if start is None: return 0
+        prefix = widget.get(f"{line}.0", "insert")
+        return start + len(prefix.encode(self.document.encoding.replace("-sig", ""), errors="replace"))
+
+    def on_view_change(self):
+        """表示範囲がウィンドウの端に近づいたら、表示位置を中心にウィンドウを読み直す"""
+        if self._loading: return
+        first, last = self.editor.visible_lines()
+        total = self.document.line_count
+        near_top = first < self.MARGIN_LINES and self.window_start > 0
+        near_bottom = last > self.window_lines - self.MARGIN_LINES and self.window_start + self.window_lines < total
+        if not (near_top or near_bottom): return
+        top = self.window_start + first - 1
+        new_start = max(0, top - (self.WINDOW_LINES - (last - first)) // 2)
+        if new_start == self.window_start: return
+        self.load_window(new_start)
+        self.editor.textbox._textbox.yview(f"{top - new_start + 1}.0")
+
+    def _to_file_fractions(self, first, last):
+        total = max(self.document.line_count, 1)
+        lines = self.window_lines
+        return ((self.window_start + float(first) * lines) / total,
+                (self.window_start + float(last) * lines) / total)
+
+    def _on_scrollbar(self, *args):
+        if args and args[0] == "moveto":
+            line = int(float(args[1]) * self.document.line_count)
+            self.show_line(max(0, min(line, self.document.line_count - 1)))
+        else:
+            self.editor.textbox._textbox.yview(*args)
+
+    def watch_indexing(self):
+        """索引ができあがったら、今の表示範囲を読み直す (索引の作成中は遠くの行を読めないことがある)"""
+        if self._closed: return
+        if not self.document.complete:
+            self.editor.after(self.INDEX_POLL_MS, self.watch_indexing)
+            return
+        widget = self.editor.textbox._textbox
+        insert, top = widget.index("insert"), widget.index("@0,0")
+        self.load_window(self.window_start)
+        widget.yview(top)
+        widget.mark_set("insert", insert)
+
+    def close(self):
+        self._closed = True
+        self.document.close()
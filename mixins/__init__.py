@@ -5,6 +5,9 @@ from .search_operations import SearchOperationsMixin
 from .settings_operations import SettingsOperationsMixin
 from .markdown_operations import MarkdownEditMixin
 from .import_operations import ImportOperationsMixin
+from .global_search_operations import GlobalSearchMixin
+from .recovery_operations import RecoveryMixin
+from .session_operations import SessionMixin
 
 __all__ = [
     "TabOperationsMixin",
@@ -13,4 +16,7 @@ __all__ = [
     "SettingsOperationsMixin",
     "MarkdownEditMixin",
     "ImportOperationsMixin",
+    "GlobalSearchMixin",
+    "RecoveryMixin",
+    "SessionMixin",
 ]
@@ -1,10 +1,23 @@
 from tkinter import filedialog, messagebox
 from config import AppConfig
+from file_io import SNIFF_SIZE, ChunkedFileLoader, detect_encoding, read_text, write_text_atomic
+from large_file import LargeFileDocument, LargeFileView
 import pypandoc
 import shutil
+import threading
+import queue
 import os
 
 class FileOperationsMixin:
+    # この大きさを超えるファイルはワーカーで読み込み、少しずつエディタに流し込む
+    ASYNC_LOAD_SIZE = 1024 * 1024
+    # 1回のイベントループでエディタに挿入する最大文字数
+    INSERT_BATCH_CHARS = 512 * 1024
+    # この大きさを超えるファイルは読み取り専用の大容量ファイルビュー (mmap) で開くか確認する
+    LARGE_FILE_SIZE = 256 * 1024 * 1024
+    # 保存の完了を確かめる間隔 (ミリ秒)
+    SAVE_POLL_MS = 50
+
     def open_file(self):
         # 選択できるファイル形式を拡張
         file_types = [
@@ -15,13 +28,17 @@ class FileOperationsMixin:
             ("All files", "*.*")
         ]
         
-        path = filedialog.askopenfilename(
+        paths = filedialog.askopenfilenames(
             initialdir=AppConfig.settings["default_dir"],
             filetypes=file_types
         )
         
-        if not path: return
-        
+        if not paths: return
+        # 複数選択したときは最後のファイルだけを表示し、他はタブを初めて表示したときに読み込む
+        for i, path in enumerate(paths):
+            self._open_selected_file(path, background=i < len(paths) - 1)
+
+    def _open_selected_file(self, path, background=False):
         ext = os.path.splitext(path)[1].lower()
         # HTML/CSSの場合の選択肢
         if ext in [".html", ".htm", ".css"]:
@@ -37,17 +54,14 @@ class FileOperationsMixin:
             return
 
         # 通常のファイル読み込み処理
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                content = f.read()
-            self.add_new_tab(file_path=path, content=content)
-            # 最近のファイルリストに追加
-            self._add_to_recent(path)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to read: {e}")
+        self.open_text_file(path, background=background)
     
-    def open_file_by_path(self, path):
-        """指定したパスのファイルを開く（起動時引数や履歴からの呼び出し用）"""
+    def open_file_by_path(self, path, on_loaded=None, background=False):
+        """指定したパスのファイルを開く（起動時引数や履歴からの呼び出し用）
+
+        on_loaded(tab_id) は内容をすべて読み込み終えたときに呼ばれる。
+        background なら読み込みはタブを初めて表示するときまで遅らせる。
+        """
         if not os.path.exists(path):
             messagebox.showerror(
                 AppConfig.t("file_not_found"),
@@ -67,18 +81,133 @@ class FileOperationsMixin:
             return
         
         # 通常のテキストファイル
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                content = f.read()
-            self.add_new_tab(file_path=path, content=content)
+        self.open_text_file(path, on_loaded, background)
+
+    def open_text_file(self, path, on_loaded=None, background=False):
+        """テキストファイルを新しいタブで開く。大きなファイルはワーカーで読みながら少しずつ流し込む"""
+        if background:
+            # タブだけを追加し、ファイルは初めて表示するときに読み込む
+            self._add_background_tab({"path": os.path.abspath(path), "on_loaded": on_loaded})
             self._add_to_recent(path)
+            return
+        try:
+            large = self._ask_large_file_view(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to read: {e}")
+            return
+
+        tab_id = self._add_tab_entry(path)
+        loaded = self._load_file_into_tab(tab_id, path, on_loaded, large)
+        if loaded is None:
+            self._remove_tab_entry(tab_id)
+            return
+        self._add_to_recent(path)
+        self.show_editor_view()
+        self.switch_tab(tab_id)
+        if loaded and on_loaded: on_loaded(tab_id)
+
+    def _ask_large_file_view(self, path):
+        """大きなファイルなら、読み取り専用の大容量ファイルビューで開くかを確認する"""
+        size = os.path.getsize(path)
+        if size <= self.LARGE_FILE_SIZE: return False
+        with open(path, "rb") as f:
+            encoding = detect_encoding(f.read(SNIFF_SIZE))
+        return LargeFileDocument.supports(encoding) and messagebox.askyesno(AppConfig.t("large_file_title"), AppConfig.t(
+            "large_file_prompt", name=os.path.basename(path), size=size // (1024 * 1024)))
+
+    def _load_file_into_tab(self, tab_id, path, on_loaded=None, large=False):
+        """タブに、ファイルを読み込んだエディタを付ける
+
+        読み込み終えたら True、ワーカーで読み込み中なら False (終わったら on_loaded(tab_id) を呼ぶ)、
+        読み込めなければ None を返す。large なら読み取り専用の大容量ファイルビュー (mmap) で開く。
+        """
+        loader = document = None
+        try:
+            if large:
+                document = LargeFileDocument(path)
+            elif os.path.getsize(path) > self.ASYNC_LOAD_SIZE:
+                loader = ChunkedFileLoader(path).start()
+            else:
+                content, encoding, newline = read_text(path)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to read: {e}")
+            return None
+
+        tab = self.tabs[tab_id]
+        if document is not None:
+            # エディタには表示中の前後の行だけを読み込む
+            editor = self._attach_editor(tab_id, file_path=path)
+            tab["large_file"] = view = LargeFileView(editor, document)
+            view.load_window(0)
+            document.start_indexing()
+            view.watch_indexing()
+            return True
+        if loader is not None:
+            editor = self._attach_editor(tab_id, file_path=path)
+            tab["loader"] = loader
+            # 読み込み中の挿入は取り消し履歴に残さない。読み込み中の入力は受け付けない
+            # (末尾への挿入と混ざり、読み込み完了時に変更なしとして扱われてしまうため)
+            editor.textbox._textbox.configure(undo=False, state="disabled")
+            self.after(1, self._pump_loader, tab_id, loader, on_loaded)
+            return False
+        editor = self._attach_editor(tab_id, content, path)
+        editor.encoding, editor.newline = encoding, newline
+        self.mark_journal_clean(tab_id)
+        return True
+
+    def _pump_loader(self, tab_id, loader, on_loaded):
+        """読み込み済みのチャンクを、1回あたりの量を制限してエディタに挿入する"""
+        tab = self.tabs.get(tab_id)
+        if tab is None or tab.get("loader") is not loader: return
+        editor = tab["editor"]
+        widget = editor.textbox._textbox
+        parts, size, done = [], 0, False
+        while size < self.INSERT_BATCH_CHARS:
+            try:
+                chunk = loader.chunks.get_nowait()
+            except queue.Empty:
+                break
+            if chunk is None:
+                done = True
+                break
+            if chunk is ChunkedFileLoader.RESTART:
+                # 別のエンコーディングで先頭から読み直すので、それまでの内容を捨てる
+                parts, size = [], 0
+                widget.configure(state="normal")
+                editor.textbox.delete("1.0", "end")
+                widget.configure(state="disabled")
+                continue
+            parts.append(chunk)
+            size += len(chunk)
+        if parts:
+            widget.configure(state="normal")
+            editor.textbox.insert("end", "".join(parts))
+            widget.configure(state="disabled")
+
+        if not done:
+            if tab_id == self.current_tab_id: self.update_status_bar()
+            self.after(1, self._pump_loader, tab_id, loader, on_loaded)
+            return
+
+        del tab["loader"]
+        editor.encoding, editor.newline = loader.encoding or "utf-8", loader.newline
+        widget.configure(undo=True, state="normal")
+        widget.edit_reset()
+        editor.reset_modified()
+        self.update_status_bar()
+        if loader.error:
+            # 途中までしか読めていない内容で元のファイルを上書きしないよう、このタブは保存できなくする
+            tab["read_error"] = loader.error
+            messagebox.showerror("Error", f"Failed to read: {loader.error}")
+            return
+        self.mark_journal_clean(tab_id)
+        if on_loaded: on_loaded(tab_id)
 
     def save_file(self):
         if not self.current_tab_id: return
         tab = self.tabs[self.current_tab_id]
         editor = tab["editor"]
+        if not self._can_save(tab): return
         
         # 既存ファイルの場合はそのまま保存、新規ファイルの場合はinitialdirを設定
         if editor.file_path:
@@ -91,32 +220,14 @@ class FileOperationsMixin:
                 initialdir=initial_dir
             )
         
-        if path:
-            try:
-                with open(path, "w", encoding="utf-8") as f:
-                    f.write(editor.get("1.0", "end-1c"))
-                editor.file_path = path
-                editor.mode = editor._detect_mode(path)
-                editor.apply_highlight()
-                tab["name"] = os.path.basename(path)
-                tab["btn"].configure(text=tab["name"])
-                editor.reset_modified()
-                
-                # 保存先ディレクトリを記憶
-                AppConfig.settings["last_save_dir"] = os.path.dirname(path)
-                
-                # 最近のファイルリストに追加
-                self._add_to_recent(path)
-                
-                self.update_status_bar()
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+        if path: self._save_to(self.current_tab_id, path)
     
     def save_file_as(self):
         """別名で保存機能"""
         if not self.current_tab_id: return
         tab = self.tabs[self.current_tab_id]
         editor = tab["editor"]
+        if not self._can_save(tab): return
         
         # initialdirを現在のファイルのディレクトリまたはlast_save_dirに設定
         if editor.file_path:
@@ -130,27 +241,97 @@ class FileOperationsMixin:
             initialfile=os.path.basename(editor.file_path) if editor.file_path else "untitled.txt"
         )
         
-        if path:
+        if path: self._save_to(self.current_tab_id, path)
+
+    def _can_save(self, tab):
+        # 読み込み途中の内容や、一部しか読み込んでいない大容量ファイルで元のファイルを上書きしない
+        if "loader" in tab or "large_file" in tab: return False
+        if "read_error" in tab:
+            messagebox.showerror("Error", AppConfig.t("partial_file_no_save"))
+            return False
+        return True
+
+    def _save_to(self, tab_id, path):
+        """内容をその場で写し取り、書き込みはワーカーで行う (一時ファイルに書いて fsync してから置き換える)
+
+        ワーカーからは Tk を呼ばない (終了時に書き終わりを待つ間、メインスレッドは Tk の呼び出しに応えられない)。
+        結果はキューに入れ、_poll_saves が UI スレッドで受け取る。
+        """
+        tab = self.tabs[tab_id]
+        if "saving" in tab:
+            # 保存中にもう一度保存されたら、今の保存が終わってから最新の内容で保存し直す
+            tab["save_again"] = path
+            return
+        editor = tab["editor"]
+        text = editor.get("1.0", "end-1c")
+        version, encoding, newline = editor.version, editor.encoding, editor.newline
+
+        done = threading.Event()
+
+        def write():
             try:
-                with open(path, "w", encoding="utf-8") as f:
-                    f.write(editor.get("1.0", "end-1c"))
+                write_text_atomic(path, text, encoding=encoding, newline=newline, fsync=True)
+                error = None
+            except Exception as e:
+                error = e
+            self._save_results.put((done, tab_id, path, version, error))
+            done.set()
+
+        tab["saving"] = done
+        self._pending_saves.add(done)
+        threading.Thread(target=write, daemon=True).start()
+        if self._save_poll_job is None: self._save_poll_job = self.after(self.SAVE_POLL_MS, self._poll_saves)
+        self.update_status_bar()
+
+    def _poll_saves(self):
+        """書き終わった保存の後処理を UI スレッドで行う"""
+        self._save_poll_job = None
+        while True:
+            try:
+                done, *result = self._save_results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending_saves.discard(done)
+            self._on_saved(*result)
+        if self._pending_saves: self._save_poll_job = self.after(self.SAVE_POLL_MS, self._poll_saves)
+
+    def _on_saved(self, tab_id, path, version, error):
+        """書き込みが終わったときの処理。保存中に編集されていれば変更ありのままにする"""
+        tab = self.tabs.get(tab_id)
+        if tab is None: return
+        tab.pop("saving", None)
+        again = tab.pop("save_again", None)
+        if error is not None:
+            messagebox.showerror("Error", str(error))
+        else:
+            editor = tab["editor"]
+            if editor.file_path != path:
                 editor.file_path = path
                 editor.mode = editor._detect_mode(path)
                 editor.apply_highlight()
                 tab["name"] = os.path.basename(path)
-                tab["btn"].configure(text=tab["name"])
+            if editor.version == version:
                 editor.reset_modified()
-                
-                # 保存先ディレクトリを記憶
-                AppConfig.settings["last_save_dir"] = os.path.dirname(path)
-                
-                # 最近のファイルリストに追加
-                self._add_to_recent(path)
-                
-                self.update_status_bar()
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
-    
+                tab["btn"].configure(text=tab["name"])
+                self.mark_journal_clean(tab_id)
+            else:
+                tab["btn"].configure(text=f"{tab['name']} *")
+                # ジャーナルの元にしていたファイルが置き換わったので、今の内容の写しから記録し直す
+                self.compact_journal(tab_id)
+            
+            # 保存先ディレクトリを記憶
+            AppConfig.settings["last_save_dir"] = os.path.dirname(path)
+            
+            # 最近のファイルリストに追加
+            self._add_to_recent(path)
+        if again: self._save_to(tab_id, again)
+        if tab_id == self.current_tab_id: self.update_status_bar()
+
+    def wait_for_saves(self, timeout=None):
+        """書き込み中の保存が終わるまで待つ (終了時に書きかけで終わらないように)"""
+        for done in list(self._pending_saves):
+            done.wait(timeout)
+
     def _add_to_recent(self, path):
         """最近のファイルリストに追加（最大10件まで）"""
         abs_path = os.path.abspath(path)
@@ -0,0 +1,207 @@
+import os
+import queue
+import re
+import threading
+from config import AppConfig
+from search_engine import compile_query, iter_line_matches
+from folder_search import search_folder
+from ui_components import SearchResultsPanel
+from .tab_operations import pending_text
+
+class GlobalSearchMixin:
+    """開いている全タブを横断する検索。結果は届いた分から結果パネルに流し込む"""
+    # 結果の上限と、1回のポーリングでパネルに追加する最大件数
+    MAX_GLOBAL_RESULTS = 5000
+    RESULTS_PER_TICK = 300
+    # 結果行に表示する行の文字列の最大長
+    RESULT_LINE_WIDTH = 200
+
+    def init_global_search(self):
+        self.results_visible = False
+        self.results_panel = SearchResultsPanel(self.editor_container, on_select=self._on_result_select, on_close=self.hide_search_results)
+        self._global_search_cancel = None
+        self._global_search_job = None
+        self._global_search_key = None
+
+    def show_search_results(self):
+        if not self.results_visible:
+            self.results_panel.place(relx=0, rely=1.0, relwidth=1.0, relheight=0.35, anchor="sw")
+            self.results_visible = True
+        self.results_panel.lift()
+        if self.search_active: self.search_frame.lift()
+
+    def hide_search_results(self):
+        self.cancel_global_search()
+        if self.results_visible:
+            self.results_panel.place_forget()
+            self.results_visible = False
+        self._global_search_key = None
+
+    def schedule_find_in_tabs(self, delay=250):
+        """入力が落ち着いてから検索を開始する。実行中の検索はこの時点で中止する"""
+        # タブ切り替え等で呼ばれても、条件が同じなら表示中の結果をそのまま使う
+        key = (self.search_entry.get(), self.search_regex.get(), self.search_whole_word.get(), self.search_case.get())
+        if key == self._global_search_key and self.results_visible: return
+        self._global_search_key = key
+        self.cancel_global_search()
+        self._global_search_job = self.after(delay, self.find_in_tabs)
+
+    def cancel_global_search(self):
+        if self._global_search_job is not None:
+            self.after_cancel(self._global_search_job)
+            self._global_search_job = None
+        if self._global_search_cancel is not None:
+            self._global_search_cancel.set()
+            self._global_search_cancel = None
+
+    def find_in_tabs(self):
+        self._global_search_job = None
+        query = self.search_entry.get()
+        if not query:
+            self.hide_search_results()
+            return
+        try:
+            pattern = compile_query(query, regex=self.search_regex.get(),
+                                    whole_word=self.search_whole_word.get(), case_sensitive=self.search_case.get())
+        except re.error:
+            return
+        # エディタのテキストの取得だけは UI スレッドで行い、走査はワーカーに任せる
+        # まだエディタを作っていないタブは、ワーカーで保持している内容かファイルを読む
+        snapshots = []
+        for tab_id in self.tab_order:
+            tab = self.tabs[tab_id]
+            source = dict(tab["pending"]) if "pending" in tab else tab["editor"].get("1.0", "end-1c")
+            snapshots.append((tab_id, tab["name"], source))
+
+        def producer(cancel, emit):
+            for tab_id, name, text in snapshots:
+                if cancel.is_set(): return
+                if isinstance(text, dict):
+                    text = pending_text(text)
+                    if text is None: continue
+                batch = []
+                for line, col, end_line, end_col, line_text in iter_line_matches(pattern, text):
+                    label = f"{name}:{line}: {line_text.strip()[:self.RESULT_LINE_WIDTH]}"
+                    batch.append((label, ("tab", tab_id, f"{line}.{col}", f"{end_line}.{end_col}")))
+                    if len(batch) >= self.RESULTS_PER_TICK:
+                        if not emit(batch): return
+                        batch = []
+                if batch and not emit(batch): return
+
+        self.start_global_search(AppConfig.t("results_in_tabs", query=query), producer)
+
+    def find_in_folder(self, event=None):
+        """設定の既定フォルダ以下のファイルを、検索バーの条件でプロセスプールを使って検索する"""
+        if not self.search_active:
+            self.toggle_search()
+            if not self.search_active: return
+        query = self.search_entry.get()
+        if not query: return
+        options = dict(regex=self.search_regex.get(), whole_word=self.search_whole_word.get(), case_sensitive=self.search_case.get())
+        try:
+            compile_query(query, **options)
+        except re.error:
+            return
+        root = AppConfig.settings["default_dir"]
+        # 全タブ検索の条件キャッシュで結果が上書きされないようにする
+        self._global_search_key = None
+
+        def producer(cancel, emit):
+            def emit_files(results):
+                return emit([(f"{os.path.relpath(path, root)}:{line}: {text.strip()}", ("file", path, f"{line}.{col}", f"{line}.{end_col}"))
+                             for path, line, col, end_col, text in results])
+            search_folder(root, query, cancel, emit_files, **options)
+
+        self.start_global_search(AppConfig.t("results_in_folder", query=query, folder=root), producer)
+
+    def start_global_search(self, title, producer):
+        """producer(cancel, emit) をワーカースレッドで実行し、emit された結果をパネルへ流す
+
+        emit は上限に達するか中止されると False を返すので、producer はそこで打ち切る。
+        """
+        self.cancel_global_search()
+        cancel = threading.Event()
+        results = queue.Queue()
+        count = [0]
+        self._global_search_cancel = cancel
+
+        def emit(batch):
+            if cancel.is_set(): return False
+            batch = batch[:self.MAX_GLOBAL_RESULTS - count[0]]
+            count[0] += len(batch)
+            results.put(batch)
+            return count[0] < self.MAX_GLOBAL_RESULTS
+
+        def run():
+            try:
+                producer(cancel, emit)
+            except Exception as e:
+                print(f"検索エラー: {e}")
+            finally:
+                results.put(None)
+
+        self.results_panel.clear(title)
+        self.results_panel.set_status(AppConfig.t("results_searching", count=0))
+        self.show_search_results()
+        threading.Thread(target=run, daemon=True).start()
+        self.after(30, self._drain_global_results, cancel, results)
+
+    def _drain_global_results(self, cancel, results):
+        """ワーカーの結果を少しずつパネルへ追加する (1回の量を制限して UI を止めない)"""
+        if cancel.is_set(): return
+        rows, done = [], False
+        while len(rows) < self.RESULTS_PER_TICK:
+            try:
+                batch = results.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                done = True
+                break
+            rows.extend(batch)
+        self.results_panel.append(rows)
+        count = len(self.results_panel)
+        if not done:
+            self.results_panel.set_status(AppConfig.t("results_searching", count=count))
+            self.after(30, self._drain_global_results, cancel, results)
+            return
+        if count >= self.MAX_GLOBAL_RESULTS:
+            self.results_panel.set_status(AppConfig.t("results_truncated", count=count))
+        else:
+            self.results_panel.set_status(AppConfig.t("results_done", count=count))
+        if self._global_search_cancel is cancel: self._global_search_cancel = None
+
+    def _on_result_select(self, payload):
+        kind, target, start, end = payload
+        if kind == "tab":
+            tab_id = target
+        else:
+            # 既に開いているファイルならそのタブへ、なければ新しく開く
+            path = os.path.normcase(os.path.abspath(target))
+            tab_id = next((t for t in self.tab_order
+                           if self.tab_file_path(t) and os.path.normcase(os.path.abspath(self.tab_file_path(t))) == path), None)
+            if tab_id is None:
+                # 読み込みが終わってから一致箇所へ移動する
+                self.open_file_by_path(target, on_loaded=lambda loaded_id: self._select_result(loaded_id, start, end, True))
+                return
+        self._select_result(tab_id, start, end, kind == "file")
+
+    def _select_result(self, tab_id, start, end, file_position=False):
+        """一致箇所を選択する。file_position はファイル上の行番号 (大容量ファイルビューでは表示範囲の外もありうる)"""
+        if tab_id not in self.tabs: return
+        if "pending" in self.tabs[tab_id]:
+            # まだ読み込んでいないタブは、読み込み終えてから選択する
+            self.tabs[tab_id]["pending"]["on_loaded"] = lambda loaded_id: self._select_result(loaded_id, start, end, file_position)
+            self.switch_tab(tab_id)
+            return
+        if tab_id != self.current_tab_id: self.switch_tab(tab_id)
+        large = self.tabs[tab_id].get("large_file")
+        if large and file_position:
+            (line, col), (end_line, end_col) = (map(int, i.split(".")) for i in (start, end))
+            start = large.to_index(line - 1, col)
+            end = f"{int(start.split('.')[0]) + end_line - line}.{end_col}"
+        textbox = self.tabs[tab_id]["editor"].textbox
+        textbox.mark_set("insert", start)
+        textbox.tag_remove("sel", "1.0", "end")
+        textbox.tag_add("sel", start, end)
+        textbox.see(start)
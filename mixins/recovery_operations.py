@@ -0,0 +1,107 @@
+import os
+import shutil
+from tkinter import messagebox
+from config import AppConfig
+from recovery import RECOVERY_DIR_NAME, RecoveryJournal, file_signature, load_crashed
+
+
+class RecoveryMixin:
+    """未保存の編集をジャーナルに記録し、クラッシュ後の起動時に復元を提案する"""
+    # 編集差分をジャーナルに書き出す間隔 (ミリ秒)
+    JOURNAL_FLUSH_MS = 1000
+
+    def init_recovery(self):
+        root = os.path.join(AppConfig.APP_DIR_PATH, RECOVERY_DIR_NAME)
+        # 自分のセッションを作る前に、前回クラッシュしたセッションを調べておく
+        self._crashed_sessions, self._crashed_tabs, self._unreplayable_tabs = load_crashed(root)
+        try:
+            self.journal = RecoveryJournal(root)
+        except OSError as e:
+            print(f"復旧ジャーナル作成エラー: {e}")
+            self.journal = None
+            return
+        self.after(self.JOURNAL_FLUSH_MS, self._flush_journal)
+        if self._crashed_sessions: self.after(200, self.offer_recovery)
+
+    def offer_recovery(self):
+        """前回クラッシュしたときの未保存のタブを復元するか確認する"""
+        sessions, entries, failed = self._crashed_sessions, self._crashed_tabs, self._unreplayable_tabs
+        self._crashed_sessions, self._crashed_tabs, self._unreplayable_tabs = [], [], []
+        if entries:
+            names = "\n".join(f"・{meta.get('path') or meta.get('name')}" for meta, _, _ in entries)
+            if messagebox.askyesno(AppConfig.t("recovery_title"), AppConfig.t("recovery_prompt", count=len(entries), names=names)):
+                # エディタは各タブを表示するときに作る
+                for meta, text, _ in entries:
+                    self._restore_tab(meta, text)
+        # 差分を当てられなかったジャーナルは消さずに残し、どのタブかを知らせる
+        kept = {os.path.dirname(path) for _, path in failed}
+        if failed:
+            names = "\n".join(f"・{label}" for label, _ in failed)
+            messagebox.showwarning(AppConfig.t("recovery_title"), AppConfig.t(
+                "recovery_failed", names=names, folders="\n".join(sorted(kept))))
+        for directory in sessions:
+            if directory not in kept:
+                shutil.rmtree(directory, ignore_errors=True)
+        # 残したセッションからは、処理済みのジャーナルだけを消す (次回また提案しないように)
+        for _, _, path in entries:
+            if os.path.dirname(path) in kept:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _restore_tab(self, meta, text):
+        tab_id = self._add_background_tab({"path": meta.get("path"), "content": text, "encoding": meta.get("encoding"),
+                                           "newline": meta.get("newline"), "modified": True})
+        # 復元した内容は元のファイルと違うので、写しからジャーナルを書き始める
+        if self.journal: self.journal.start(tab_id, dict(meta, name=self.tabs[tab_id]["name"], base=None), text)
+        self.update_status_bar()
+
+    def _journal_meta(self, tab_id, base=None):
+        editor = self.tabs[tab_id]["editor"]
+        return {"name": self.tabs[tab_id]["name"], "path": editor.file_path,
+                "encoding": editor.encoding, "newline": editor.newline, "base": base}
+
+    def _journal_edit(self, tab_id, line, col, end_line, end_col, text):
+        """EditorView の編集ごとに呼ばれ、差分をジャーナルに記録する"""
+        if self.journal is None: return
+        tab = self.tabs.get(tab_id)
+        # 作成中・読み込み中のタブと、読み取り専用の大容量ファイルビュー、最後まで読めなかったタブは記録しない
+        if tab is None or "editor" not in tab or "loader" in tab or "large_file" in tab or "read_error" in tab: return
+        if tab_id not in self.journal:
+            editor = tab["editor"]
+            base = tab.get("disk_signature")
+            if editor.file_path and not editor.is_modified and base and file_signature(editor.file_path) == base:
+                # 内容がディスク上のファイルと同じなら、ファイルを元にして写しを書かずに済ませる
+                self.journal.start(tab_id, self._journal_meta(tab_id, base))
+            else:
+                self.journal.start(tab_id, self._journal_meta(tab_id), editor.get("1.0", "end-1c"))
+        self.journal.record(tab_id, line, col, end_line, end_col, text)
+
+    def mark_journal_clean(self, tab_id):
+        """タブの内容がディスク上のファイルと一致したとき (読み込み・保存の完了時) に呼ぶ"""
+        tab = self.tabs.get(tab_id)
+        if tab is None: return
+        tab["disk_signature"] = file_signature(tab["editor"].file_path) if tab["editor"].file_path else None
+        # この版のままなら内容はディスク上のファイルと同じ (is_modified は一部のキー入力では立たないので版で見る)
+        tab["clean_version"] = tab["editor"].version
+        if self.journal: self.journal.discard(tab_id)
+
+    def compact_journal(self, tab_id):
+        """たまった差分を今の内容の写しに置き換える"""
+        if self.journal is None or tab_id not in self.journal: return
+        self.journal.start(tab_id, self._journal_meta(tab_id), self.tabs[tab_id]["editor"].get("1.0", "end-1c"))
+
+    def _flush_journal(self):
+        for tab_id, tab in self.tabs.items():
+            if "editor" in tab and self.journal.needs_compaction(tab_id, tab["editor"].stats.chars):
+                self.compact_journal(tab_id)
+        self.journal.flush()
+        self.after(self.JOURNAL_FLUSH_MS, self._flush_journal)
+
+    def discard_journal(self, tab_id):
+        if self.journal: self.journal.discard(tab_id)
+
+    def close_journal(self):
+        """正常終了時に呼ぶ (このセッションのジャーナルを削除する)"""
+        if self.journal: self.journal.close()
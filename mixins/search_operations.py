@@ -1,20 +1,58 @@
+import re
+import threading
 import customtkinter as ctk
-from config import AppConfig
+from config import AppConfig, CTkToolTip
+from search_engine import SearchEngine, compile_query, expand_match, line_starts, offset_to_index, replace_all
 
 class SearchOperationsMixin:
+    # 表示範囲に付ける強調タグの上限
+    MAX_VISIBLE_MATCHES = 500
+
     def init_search_ui(self):
         self.search_active = False
+        self.search_engine = SearchEngine()
+        # 大容量ファイルビューで最後に始めた検索 (古い検索の結果は捨てる)
+        self._large_search_job = None
+        self.search_regex = ctk.BooleanVar(value=False)
+        self.search_whole_word = ctk.BooleanVar(value=False)
+        self.search_case = ctk.BooleanVar(value=False)
+        self.search_all_tabs = ctk.BooleanVar(value=False)
         self.search_frame = ctk.CTkFrame(self.editor_container, height=45, fg_color=AppConfig.COLORS["toolbar_bg"], border_width=1, border_color="gray50")
-        
-        self.search_entry = ctk.CTkEntry(self.search_frame, placeholder_text="Find...", width=200)
+        find_row = ctk.CTkFrame(self.search_frame, fg_color="transparent")
+        find_row.pack(side="top", fill="x", padx=2, pady=(2, 0))
+
+        self.search_entry = ctk.CTkEntry(find_row, placeholder_text="Find...", width=200)
         self.search_entry.pack(side="left", padx=10, pady=5)
         self.search_entry.bind("<KeyRelease>", self._on_search_change)
         self.search_entry.bind("<Return>", lambda e: self._on_search_next())
 
-        ctk.CTkButton(self.search_frame, text="<", width=30, command=self._on_search_prev).pack(side="left", padx=2)
-        ctk.CTkButton(self.search_frame, text=">", width=30, command=self._on_search_next).pack(side="left", padx=2)
+        for text, var, tip in (("Aa", self.search_case, "search_case"), ("W", self.search_whole_word, "search_whole_word"), (".*", self.search_regex, "search_regex"), ("⧉", self.search_all_tabs, "search_all_tabs")):
+            box = ctk.CTkCheckBox(find_row, text=text, variable=var, width=20, checkbox_width=16, checkbox_height=16,
+                                  command=self._on_search_change)
+            box.pack(side="left", padx=2)
+            CTkToolTip(box, AppConfig.t(tip))
+
+        folder_btn = ctk.CTkButton(find_row, text="📁", width=30, command=self.find_in_folder)
+        folder_btn.pack(side="left", padx=2)
+        CTkToolTip(folder_btn, f"{AppConfig.t('find_in_folder')} (Ctrl+Shift+F)")
+
+        self.search_count_label = ctk.CTkLabel(find_row, text="", width=70, text_color=AppConfig.COLORS["text_secondary"])
+        self.search_count_label.pack(side="left", padx=4)
 
-        ctk.CTkButton(self.search_frame, text="×", width=30, fg_color="transparent", hover_color="#AA3333", command=self.toggle_search).pack(side="left", padx=10)
+        ctk.CTkButton(find_row, text="<", width=30, command=self._on_search_prev).pack(side="left", padx=2)
+        ctk.CTkButton(find_row, text=">", width=30, command=self._on_search_next).pack(side="left", padx=2)
+
+        ctk.CTkButton(find_row, text="×", width=30, fg_color="transparent", hover_color="#AA3333", command=self.toggle_search).pack(side="left", padx=10)
+
+        replace_row = ctk.CTkFrame(self.search_frame, fg_color="transparent")
+        replace_row.pack(side="top", fill="x", padx=2, pady=(0, 2))
+        self.replace_entry = ctk.CTkEntry(replace_row, placeholder_text="Replace...", width=200)
+        self.replace_entry.pack(side="left", padx=10, pady=5)
+        self.replace_entry.bind("<Return>", lambda e: self._on_replace())
+        self.btn_replace = ctk.CTkButton(replace_row, text=AppConfig.t("replace"), width=70, command=self._on_replace)
+        self.btn_replace.pack(side="left", padx=2)
+        self.btn_replace_all = ctk.CTkButton(replace_row, text=AppConfig.t("replace_all"), width=90, command=self._on_replace_all)
+        self.btn_replace_all.pack(side="left", padx=2)
 
     def toggle_search(self, event=None):
         if not self.current_tab_id: return
@@ -29,42 +67,189 @@ class SearchOperationsMixin:
             self.search_active = False
             if self.current_tab_id in self.tabs:
                 self.tabs[self.current_tab_id]["editor"].textbox.tag_remove("search_match", "1.0", "end")
+            self.search_engine.invalidate()
+
+    def _search_index(self, editor):
+        """現在の検索条件の一致索引。条件と文書が変わっていなければキャッシュを返す"""
+        try:
+            index = self.search_engine.index_for(
+                editor, self.search_entry.get(), regex=self.search_regex.get(),
+                whole_word=self.search_whole_word.get(), case_sensitive=self.search_case.get())
+        except re.error:
+            self.search_count_label.configure(text=AppConfig.t("search_invalid"))
+            return None
+        return index
+
+    def _update_search_count(self, index, current=None):
+        if index is None:
+            self.search_count_label.configure(text="")
+        elif not len(index):
+            self.search_count_label.configure(text=AppConfig.t("search_no_results"))
+        else:
+            n = "?" if current is None else current + 1
+            self.search_count_label.configure(text=AppConfig.t("search_count", n=n, total=len(index)))
+
+    def _highlight_visible_matches(self, editor, index):
+        """表示範囲内の一致だけを上限付きで強調する"""
+        widget = editor.textbox._textbox
+        widget.tag_remove("search_match", "1.0", "end")
+        if not index: return
+        first, last = editor.visible_lines()
+        ranges = index.between_lines(first, last, self.MAX_VISIBLE_MATCHES)
+        if ranges:
+            widget.tag_add("search_match", *[i for pair in ranges for i in pair])
 
     def _on_search_change(self, event=None):
         if not self.current_tab_id: return
-        query = self.search_entry.get()
         editor = self.tabs[self.current_tab_id]["editor"]
-        editor.textbox.tag_remove("search_match", "1.0", "end")
+        index = self._search_index(editor)
+        if index is None and self.search_entry.get():
+            editor.textbox.tag_remove("search_match", "1.0", "end")
+            return
+        self._highlight_visible_matches(editor, index)
+        if "large_file" in self.tabs[self.current_tab_id]:
+            # エディタにはファイルの一部しかないので件数は出さない
+            self._update_search_count(None)
+            return
+        current = None
+        if index:
+            current = index.position_of(index.to_offset(editor.textbox.index("insert")))
+        self._update_search_count(index, current)
+        # 全タブ検索は入力が落ち着いてからワーカーで行う
+        if self.search_all_tabs.get(): self.schedule_find_in_tabs()
+
+    def _on_search_view_change(self, tab_id):
+        """スクロール等で表示範囲が変わったら、その範囲の一致を強調し直す"""
+        if not self.search_active or tab_id != self.current_tab_id: return
+        editor = self.tabs[tab_id]["editor"]
+        index = self._search_index(editor)
+        if index is not None: self._highlight_visible_matches(editor, index)
+
+    def _jump_to_match(self, editor, index, i):
+        if i is None:
+            self._update_search_count(index)
+            return
+        start, end = index.to_index(index.starts[i]), index.to_index(index.ends[i])
+        editor.textbox.mark_set("insert", start)
+        editor.textbox.tag_remove("sel", "1.0", "end")
+        editor.textbox.tag_add("sel", start, end)
+        editor.textbox.see(start)
+        self._highlight_visible_matches(editor, index)
+        self._update_search_count(index, i)
+
+    def _search_large_file(self, view, forward):
+        """大容量ファイルビューでは mmap 上を直接検索し、見つかった位置まで表示範囲を移す"""
+        query = self.search_entry.get()
         if not query: return
+        document = view.document
+        try:
+            pattern = document.compile(query, regex=self.search_regex.get(),
+                                       whole_word=self.search_whole_word.get(), case_sensitive=self.search_case.get())
+        except re.error:
+            self.search_count_label.configure(text=AppConfig.t("search_invalid"))
+            return
+        offset = view.insert_offset()
+        tab_id = self.current_tab_id
+        # 正規表現での全体走査は時間がかかるのでワーカーで行い、最後に始めた検索の結果だけを反映する
+        self._large_search_job = job = object()
 
-        start_pos = "1.0"
-        while True:
-            start_pos = editor.textbox.search(query, start_pos, stopindex="end", nocase=True)
-            if not start_pos: break
-            end_pos = f"{start_pos}+{len(query)}c"
-            editor.textbox.tag_add("search_match", start_pos, end_pos)
-            start_pos = end_pos
+        def run():
+            try:
+                # 前方検索はカーソル位置の一致 (前回選択した一致) を飛ばす
+                span = document.search(pattern, offset + 1 if forward else offset, forward)
+                if span is not None: span = (document.position(span[0]), document.position(span[1]))
+            except ValueError:
+                # 検索中にタブが閉じられた
+                return
+            self.call_in_ui(self._show_large_file_match, tab_id, view, job, span)
+        threading.Thread(target=run, daemon=True).start()
+
+    def _show_large_file_match(self, tab_id, view, job, span):
+        if job is not self._large_search_job or tab_id != self.current_tab_id: return
+        tab = self.tabs.get(tab_id)
+        if tab is None or tab.get("large_file") is not view: return
+        if span is None:
+            self.search_count_label.configure(text=AppConfig.t("search_no_results"))
+            return
+        (line, col), (end_line, end_col) = span
+        editor = tab["editor"]
+        start = view.to_index(line, col)
+        end = f"{int(start.split('.')[0]) + end_line - line}.{end_col}"
+        editor.textbox.mark_set("insert", start)
+        editor.textbox.tag_remove("sel", "1.0", "end")
+        editor.textbox.tag_add("sel", start, end)
+        editor.textbox.see(start)
+        self._on_search_view_change(tab_id)
+        self.search_count_label.configure(text=AppConfig.t("search_at_line", line=line + 1))
 
     def _on_search_next(self):
         if not self.current_tab_id: return
-        query = self.search_entry.get()
-        if not query: return
         editor = self.tabs[self.current_tab_id]["editor"]
-        current_pos = editor.textbox.index("insert+1c")
-        idx = editor.textbox.search(query, current_pos, stopindex="end", nocase=True)
-        if not idx: idx = editor.textbox.search(query, "1.0", stopindex="end", nocase=True)
-        if idx:
-            editor.textbox.mark_set("insert", idx)
-            editor.textbox.see(idx)
+        if "large_file" in self.tabs[self.current_tab_id]:
+            return self._search_large_file(self.tabs[self.current_tab_id]["large_file"], True)
+        index = self._search_index(editor)
+        if index is None: return
+        self._jump_to_match(editor, index, index.next_after(index.to_offset(editor.textbox.index("insert"))))
 
     def _on_search_prev(self):
         if not self.current_tab_id: return
+        editor = self.tabs[self.current_tab_id]["editor"]
+        if "large_file" in self.tabs[self.current_tab_id]:
+            return self._search_large_file(self.tabs[self.current_tab_id]["large_file"], False)
+        index = self._search_index(editor)
+        if index is None: return
+        self._jump_to_match(editor, index, index.prev_before(index.to_offset(editor.textbox.index("insert"))))
+
+    def _replace_options(self):
         query = self.search_entry.get()
-        if not query: return
+        if not query: return None
+        try:
+            return compile_query(query, regex=self.search_regex.get(),
+                                 whole_word=self.search_whole_word.get(), case_sensitive=self.search_case.get())
+        except re.error:
+            self.search_count_label.configure(text=AppConfig.t("search_invalid"))
+            return None
+
+    def _on_replace(self):
+        """選択中の一致を置換して次の一致へ進む。一致が選択されていなければ次の一致を選択するだけ"""
+        if not self.current_tab_id: return
+        # 大容量ファイルビューは読み取り専用
+        if "large_file" in self.tabs[self.current_tab_id]: return
+        editor = self.tabs[self.current_tab_id]["editor"]
+        pattern = self._replace_options()
+        index = self._search_index(editor)
+        if pattern is None or not index: return
+        textbox = editor.textbox._textbox
+        i = index.position_of(index.to_offset(textbox.index("insert")))
+        if i is None or not textbox.tag_ranges("sel") or textbox.index("sel.first") != index.to_index(index.starts[i]) \
+                or textbox.index("sel.last") != index.to_index(index.ends[i]):
+            self._on_search_next()
+            return
+        start, end = index.starts[i], index.ends[i]
+        match = pattern.match(editor.get("1.0", "end-1c"), start)
+        if match is None or match.end() != end: return
+        replacement = expand_match(match, self.replace_entry.get(), self.search_regex.get())
+        editor.replace_range(index.to_index(start), index.to_index(end), replacement)
+        # 置換後の文字列の直後から次の一致を探す
+        index = self._search_index(editor)
+        textbox.mark_set("insert", index.to_index(start + len(replacement)))
+        self._jump_to_match(editor, index, index.next_after(start + len(replacement) - 1))
+
+    def _on_replace_all(self):
+        """全ての一致を1回の編集で置換する (取り消しも1回で戻る)"""
+        if not self.current_tab_id: return
+        # 大容量ファイルビューは読み取り専用
+        if "large_file" in self.tabs[self.current_tab_id]: return
         editor = self.tabs[self.current_tab_id]["editor"]
-        current_pos = editor.textbox.index("insert")
-        idx = editor.textbox.search(query, current_pos, stopindex="1.0", backwards=True, nocase=True)
-        if not idx: idx = editor.textbox.search(query, "end", stopindex="1.0", backwards=True, nocase=True)
-        if idx:
-            editor.textbox.mark_set("insert", idx)
-            editor.textbox.see(idx)
+        pattern = self._replace_options()
+        if pattern is None: return
+        text = editor.get("1.0", "end-1c")
+        result = replace_all(pattern, text, self.replace_entry.get(), self.search_regex.get())
+        if result is None:
+            self.search_count_label.configure(text=AppConfig.t("search_no_results"))
+            return
+        start, end, middle, count = result
+        starts = line_starts(text)
+        editor.replace_range(offset_to_index(starts, start), offset_to_index(starts, end), middle)
+        self._on_search_change()
+        self.search_count_label.configure(text=AppConfig.t("replaced_count", count=count))
@@ -0,0 +1,53 @@
+import json
+import os
+from config import AppConfig
+from file_io import write_text_atomic
+
+
+class SessionMixin:
+    """終了時に開いていたタブを保存し、次回起動時に復元する"""
+    SESSION_FILE = "session.json"
+
+    def _session_path(self):
+        return os.path.join(AppConfig.APP_DIR_PATH, self.SESSION_FILE)
+
+    def _tab_session_state(self, tab_id):
+        """タブのファイルパスとカーソル位置・表示位置 (先頭行)。ファイルに結びつかないタブは None"""
+        tab = self.tabs[tab_id]
+        if "pending" in tab:
+            # 一度も表示していないタブは前回の状態をそのまま引き継ぐ (内容を保持しているタブは保存しない)
+            state = tab["pending"]
+            if "content" in state or not state.get("path"): return None
+            return {key: state[key] for key in ("path", "caret", "top", "large") if key in state}
+        editor = tab["editor"]
+        if not editor.file_path: return None
+        return dict(self._view_state(tab_id), path=os.path.abspath(editor.file_path), large="large_file" in tab)
+
+    def save_session(self):
+        tabs, active = [], None
+        for tab_id in self.tab_order:
+            state = self._tab_session_state(tab_id)
+            if state is None: continue
+            if tab_id == self.current_tab_id: active = len(tabs)
+            tabs.append(state)
+        try:
+            write_text_atomic(self._session_path(), json.dumps({"tabs": tabs, "active": active}, ensure_ascii=False, indent=2))
+        except Exception as e:
+            print(f"セッション保存エラー: {e}")
+
+    def restore_session(self):
+        """前回のタブをタブバーに並べ、アクティブだったタブだけを読み込む (他のタブは表示したときに読み込む)"""
+        try:
+            with open(self._session_path(), "r", encoding="utf-8") as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            return
+        tab_id = active_id = None
+        for i, state in enumerate(session.get("tabs", [])):
+            if not os.path.isfile(state.get("path", "")): continue
+            tab_id = self.add_pending_tab(state)
+            if i == session.get("active"): active_id = tab_id
+        if tab_id is None: return
+        self.show_editor_view()
+        self.switch_tab(active_id or tab_id)
+        self._check_empty_state()
@@ -56,6 +56,11 @@ class SettingsOperationsMixin:
         self.interval_label.pack(side="right")
         self.interval_slider.configure(command=lambda v: self.interval_label.configure(text=f"{int(v)}s"))
 
+        self.preview_server_var = ctk.BooleanVar(value=AppConfig.settings["preview_server"])
+        self.preview_server_row = self._create_setting_row("preview_server")
+        self.preview_server_switch = ctk.CTkSwitch(self.preview_server_row, text="", variable=self.preview_server_var)
+        self.preview_server_switch.pack(side="right")
+
         # ファイル設定
         self.file_section = self._create_section_label("file_settings")
         self.dir_row = self._create_setting_row("default_dir")
@@ -63,6 +68,23 @@ class SettingsOperationsMixin:
         ctk.CTkEntry(self.dir_row, textvariable=self.dir_path_var, width=300).pack(side="left", padx=(0, 10))
         ctk.CTkButton(self.dir_row, text="...", width=40, command=self._browse_default_dir).pack(side="left")
 
+        # エディタを保持するタブの上限 (超えた分は長く表示していないタブから休止させる)
+        self.live_tabs_row = self._create_setting_row("max_live_tabs")
+        self.live_tabs_slider = ctk.CTkSlider(self.live_tabs_row, from_=2, to=100, number_of_steps=98)
+        self.live_tabs_slider.set(AppConfig.settings["max_live_tabs"])
+        self.live_tabs_slider.pack(side="right", padx=10)
+        self.live_tabs_label = ctk.CTkLabel(self.live_tabs_row, text=str(AppConfig.settings["max_live_tabs"]))
+        self.live_tabs_label.pack(side="right")
+        self.live_tabs_slider.configure(command=lambda v: self.live_tabs_label.configure(text=str(int(v))))
+
+        self.live_text_row = self._create_setting_row("max_live_text_mb")
+        self.live_text_slider = ctk.CTkSlider(self.live_text_row, from_=16, to=1024, number_of_steps=63)
+        self.live_text_slider.set(AppConfig.settings["max_live_text_mb"])
+        self.live_text_slider.pack(side="right", padx=10)
+        self.live_text_label = ctk.CTkLabel(self.live_text_row, text=str(AppConfig.settings["max_live_text_mb"]))
+        self.live_text_label.pack(side="right")
+        self.live_text_slider.configure(command=lambda v: self.live_text_label.configure(text=str(int(v))))
+
         # 言語設定
         self.lang_section = self._create_section_label("language_settings")
         self.lang_var = ctk.StringVar(value=AppConfig.settings["lang"])
@@ -149,11 +171,14 @@ class SettingsOperationsMixin:
         self.line_num_row.label.configure(text=AppConfig.t(self.line_num_row.key))
         self.grid_row.label.configure(text=AppConfig.t(self.grid_row.key))
         self.cur_line_row.label.configure(text=AppConfig.t(self.cur_line_row.key))
+        self.preview_server_row.label.configure(text=AppConfig.t(self.preview_server_row.key))
         self.file_section.configure(text=AppConfig.t(self.file_section.key))
         self.lang_section.configure(text=AppConfig.t(self.lang_section.key))
         self.mode_row.label.configure(text=AppConfig.t(self.mode_row.key))
         self.size_row.label.configure(text=AppConfig.t(self.size_row.key))
         self.dir_row.label.configure(text=AppConfig.t(self.dir_row.key))
+        self.live_tabs_row.label.configure(text=AppConfig.t(self.live_tabs_row.key))
+        self.live_text_row.label.configure(text=AppConfig.t(self.live_text_row.key))
         self.lang_row.label.configure(text=AppConfig.t(self.lang_row.key))
         self.apply_btn.configure(text=AppConfig.t("apply_btn"))
         self.back_btn.configure(text=AppConfig.t("back_btn"))
@@ -172,12 +197,19 @@ class SettingsOperationsMixin:
         AppConfig.settings["default_dir"] = self.dir_path_var.get()
         AppConfig.settings["lang"] = self.lang_var.get()
         AppConfig.settings["preview_interval"] = int(self.interval_slider.get())
+        AppConfig.settings["preview_server"] = self.preview_server_var.get()
+        AppConfig.settings["max_live_tabs"] = int(self.live_tabs_slider.get())
+        AppConfig.settings["max_live_text_mb"] = int(self.live_text_slider.get())
+        if not AppConfig.settings["preview_server"]: self.preview_server.stop()
 
         ctk.set_appearance_mode(AppConfig.settings["appearance"])
-        for tab in self.tabs.values():
-            tab["editor"].toggle_line_numbers(AppConfig.settings["show_line_numbers"])
-            tab["editor"].update_appearance()
-            tab["editor"].highlight_current_line()
+        for editor in self.live_editors():
+            editor.toggle_line_numbers(AppConfig.settings["show_line_numbers"])
+            editor.update_appearance()
+            editor.highlight_current_line()
+        self.results_panel.update_appearance()
+        # 上限を下げたときは、すぐに超えた分のタブを休止させる
+        self.enforce_tab_budget()
         
         # 設定を保存
         AppConfig.save_settings()
@@ -217,13 +249,19 @@ class SettingsOperationsMixin:
                 self.lang_var.set(AppConfig.settings["lang"])
                 self.interval_slider.set(AppConfig.settings["preview_interval"])
                 self.interval_label.configure(text=f"{AppConfig.settings['preview_interval']}s")
+                self.preview_server_var.set(AppConfig.settings["preview_server"])
+                self.live_tabs_slider.set(AppConfig.settings["max_live_tabs"])
+                self.live_tabs_label.configure(text=str(AppConfig.settings["max_live_tabs"]))
+                self.live_text_slider.set(AppConfig.settings["max_live_text_mb"])
+                self.live_text_label.configure(text=str(AppConfig.settings["max_live_text_mb"]))
                 
                 # 設定を即座に反映
                 ctk.set_appearance_mode(AppConfig.settings["appearance"])
-                for tab in self.tabs.values():
-                    tab["editor"].toggle_line_numbers(AppConfig.settings["show_line_numbers"])
-                    tab["editor"].update_appearance()
-                    tab["editor"].highlight_current_line()
+                for editor in self.live_editors():
+                    editor.toggle_line_numbers(AppConfig.settings["show_line_numbers"])
+                    editor.update_appearance()
+                    editor.highlight_current_line()
+                self.results_panel.update_appearance()
                 
                 self.update_ui_texts()
                 self.update_settings_ui_texts()
@@ -1,25 +1,71 @@
+import os
+import zlib
 import customtkinter as ctk
 from config import AppConfig
+from file_io import read_text
+from recovery import file_signature
 from ui_components import EditorView
 
+def pending_text(state):
+    """保留中のタブの内容。保持している内容 (休止中のタブは圧縮した内容) がなければファイルから読む (読めなければ None)
+
+    UI に触れないので、ワーカースレッドからも呼べる。
+    """
+    if "content" in state: return state["content"]
+    if "compressed" in state: return zlib.decompress(state["compressed"]).decode("utf-8", "surrogatepass")
+    # 大容量ファイルビューで開くファイルは丸ごと読まない
+    if state.get("large"): return None
+    try:
+        return read_text(state["path"])[0]
+    except OSError:
+        return None
+
+
 class TabOperationsMixin:
     def init_tab_system(self):
         self.tabs = {}
         self.tab_order = []
         self.current_tab_id = None
         self.tab_count = 0
+        # タブを表示した順番 (エディタを休止させるタブを選ぶのに使う)
+        self.tab_clock = 0
+
+    def add_new_tab(self, file_path=None, content="", background=False):
+        """新しいタブを追加する。background なら切り替えず、エディタも初めて表示するときまで作らない"""
+        if background:
+            return self._add_background_tab({"path": file_path, "content": content})
+        tab_id = self._add_tab_entry(file_path)
+        self._attach_editor(tab_id, content, file_path)
+        self.show_editor_view()
+        self.switch_tab(tab_id)
+        return tab_id
 
-    def add_new_tab(self, file_path=None, content=""):
+    def add_pending_tab(self, state):
+        """タブバーにだけ追加し、ファイルの読み込みとエディタの作成は初めて表示するときまで遅らせる
+
+        state は {"path", "content", "encoding", "newline", "modified"} と、セッション復元用の
+        {"caret", "top", "large"}。休止させたタブは content の代わりに圧縮した "compressed" を持つ。
+        内容がなければ表示するときに path から読み込む。
+        """
+        tab_id = self._add_tab_entry(state.get("path"))
+        self.tabs[tab_id]["pending"] = state
+        if state.get("modified"): self._mark_as_modified(tab_id)
+        return tab_id
+
+    def _add_background_tab(self, state):
+        """保留中のタブとして追加する。表示中のタブがなければそのまま表示する"""
+        tab_id = self.add_pending_tab(state)
+        if self.current_tab_id is None:
+            self.show_editor_view()
+            self.switch_tab(tab_id)
+        return tab_id
+
+    def _add_tab_entry(self, file_path=None):
+        """タブバーのボタンを作ってタブを登録する。エディタは _attach_editor で付ける"""
         self.tab_count += 1
         tab_id = f"tab_{self.tab_count}"
-        name = __import__("os").path.basename(file_path) if file_path else f"{AppConfig.t('untitled')} {self.tab_count}"
+        name = os.path.basename(file_path) if file_path else f"{AppConfig.t('untitled')} {self.tab_count}"
 
-        editor = EditorView(
-            self.editor_container, content, file_path, 
-            on_change_callback=lambda: self._mark_as_modified(tab_id),
-            on_cursor_callback=self.update_status_bar
-        )
-        
         tab_unit = ctk.CTkFrame(self.tab_bar, fg_color="transparent")
         tab_unit.pack(side="left", padx=(0, 1))
         
@@ -33,13 +79,38 @@ class TabOperationsMixin:
                                   command=lambda: self.close_tab(tab_id))
         close_btn.pack(side="left")
 
-        self.tabs[tab_id] = {"editor": editor, "tab_unit": tab_unit, "btn": btn, "name": name}
+        self.tabs[tab_id] = {"tab_unit": tab_unit, "btn": btn, "name": name}
         self.tab_order.append(tab_id)
-        
-        self.show_editor_view()
-        self.switch_tab(tab_id)
+        return tab_id
+
+    def _attach_editor(self, tab_id, content="", file_path=None):
+        editor = EditorView(
+            self.editor_container, content, file_path, 
+            on_change_callback=lambda: self._mark_as_modified(tab_id),
+            on_cursor_callback=self.update_status_bar,
+            on_view_callback=lambda: self._on_view_change(tab_id),
+            on_edit_callback=lambda *edit: self._journal_edit(tab_id, *edit)
+        )
+        self.tabs[tab_id]["editor"] = editor
+        return editor
+
+    def live_editors(self):
+        """エディタが作られているタブのエディタ (読み込み前の保留中のタブは含まない)"""
+        return [tab["editor"] for tab in self.tabs.values() if "editor" in tab]
+
+    def tab_file_path(self, tab_id):
+        tab = self.tabs[tab_id]
+        return tab["pending"].get("path") if "pending" in tab else tab["editor"].file_path
+
+    def tab_is_modified(self, tab_id):
+        tab = self.tabs[tab_id]
+        return tab["pending"].get("modified", False) if "pending" in tab else tab["editor"].is_modified
+
 
     def switch_tab(self, tab_id):
+        # 保留中のタブは初めて表示するときにファイルを読み込む
+        if "pending" in self.tabs[tab_id] and not self._materialize_tab(tab_id): return
+
         if self.current_tab_id and self.current_tab_id in self.tabs:
             old = self.tabs[self.current_tab_id]
             old["editor"].pack_forget()
@@ -52,29 +123,153 @@ class TabOperationsMixin:
         new["tab_unit"].configure(fg_color=AppConfig.COLORS["editor_bg"])
         
         self.current_tab_id = tab_id
+        self.tab_clock += 1
+        new["last_used"] = self.tab_clock
         new["editor"].focus_set()
         new["editor"].update_line_numbers()
         new["editor"].highlight_current_line()
         self.update_status_bar()
         self.update_toolbar_visibility()
+        if self.search_active: self._on_search_change()
+        self.enforce_tab_budget()
     
     def close_tab(self, tab_id):
         from tkinter import messagebox
         tab = self.tabs[tab_id]
-        if tab["editor"].is_modified:
+        if self.tab_is_modified(tab_id):
             if not messagebox.askyesno("Confirm", f"{tab['name']}{AppConfig.t('confirm_close')}"):
                 return
         
+        # 読み込み中なら読み込みを中止する
+        if "loader" in tab: tab.pop("loader").cancel()
+        if "large_file" in tab: tab.pop("large_file").close()
+        self.discard_journal(tab_id)
         if tab_id == self.current_tab_id: self.current_tab_id = None
-        tab["tab_unit"].destroy()
-        tab["editor"].destroy()
-        del self.tabs[tab_id]
-        self.tab_order.remove(tab_id)
+        self._remove_tab_entry(tab_id)
 
         if self.tab_order: self.switch_tab(self.tab_order[-1])
         self._check_empty_state()
         self.update_status_bar()
 
+    def _remove_tab_entry(self, tab_id):
+        tab = self.tabs.pop(tab_id)
+        tab["tab_unit"].destroy()
+        if "editor" in tab: tab["editor"].destroy()
+        self.tab_order.remove(tab_id)
+
+    def _materialize_tab(self, tab_id):
+        """保留中のタブのエディタを作る (内容がなければファイルを読み込む)。読み込めなければタブを閉じて False を返す
+
+        読み込み終えたら state["on_loaded"](tab_id) を、なければ保存していた表示位置の復元を行う。
+        """
+        state = self.tabs[tab_id].pop("pending")
+        path = state.get("path")
+        restore = state.get("on_loaded") or (lambda loaded_id: self._restore_view_state(loaded_id, state))
+        if "content" in state or "compressed" in state:
+            editor = self._attach_editor(tab_id, pending_text(state), path)
+            editor.encoding, editor.newline = state.get("encoding") or "utf-8", state.get("newline")
+            editor.is_modified = state.get("modified", False)
+            loaded = True
+        elif os.path.exists(path):
+            large = state.get("large")
+            if large is None: large = self._ask_large_file_view(path)
+            loaded = self._load_file_into_tab(tab_id, path, restore, large)
+        else:
+            loaded = None
+        if loaded is None:
+            self._remove_tab_entry(tab_id)
+            # 表示中のタブがあればそのまま (switch_tab はまだ何も切り替えていない)
+            if self.current_tab_id is None and self.tab_order:
+                self.switch_tab(self.tab_order[-1])
+            self._check_empty_state()
+            self.update_status_bar()
+            return False
+        # 表示位置の復元などは、タブの切り替えを終えてから行う
+        if loaded: self.after(0, restore, tab_id)
+        return True
+
+    def _view_state(self, tab_id):
+        """カーソル位置と表示位置 (先頭行)。大容量ファイルビューではファイル全体での行番号"""
+        tab = self.tabs[tab_id]
+        widget = tab["editor"].textbox._textbox
+        line, col = map(int, widget.index("insert").split("."))
+        top = int(widget.index("@0,0").split(".")[0])
+        offset = tab["editor"].line_offset if "large_file" in tab else 0
+        return {"caret": [line + offset, col], "top": top + offset}
+
+    def enforce_tab_budget(self):
+        """エディタを持つタブの数か文字数が設定の上限を超えたら、長く表示していないタブから休止させる"""
+        max_tabs = AppConfig.settings["max_live_tabs"]
+        max_chars = AppConfig.settings["max_live_text_mb"] * 1024 * 1024
+        live = [tab_id for tab_id in self.tab_order if "editor" in self.tabs[tab_id]]
+        chars = sum(self.tabs[tab_id]["editor"].stats.chars for tab_id in live)
+        count = len(live)
+        for tab_id in sorted(live, key=lambda t: self.tabs[t].get("last_used", 0)):
+            if count <= max_tabs and chars <= max_chars: break
+            if not self._can_hibernate(tab_id): continue
+            chars -= self.tabs[tab_id]["editor"].stats.chars
+            count -= 1
+            self._hibernate_tab(tab_id)
+
+    def _can_hibernate(self, tab_id):
+        # 表示中のタブと、読み込み中・保存中のタブはそのままにする
+        tab = self.tabs[tab_id]
+        return tab_id != self.current_tab_id and "loader" not in tab and "saving" not in tab
+
+    def _hibernate_tab(self, tab_id):
+        """エディタを破棄して保留中のタブに戻す。表示するときに _materialize_tab で作り直す
+
+        ディスク上のファイルと同じ内容ならパスだけを、そうでなければ圧縮した内容を残す。
+        取り消し履歴は残らない。
+        """
+        tab = self.tabs[tab_id]
+        editor = tab["editor"]
+        state = dict(self._view_state(tab_id), path=editor.file_path)
+        if "large_file" in tab:
+            state["large"] = True
+            tab.pop("large_file").close()
+        elif (editor.file_path and editor.version == tab.get("clean_version") and tab.get("disk_signature")
+              and file_signature(editor.file_path) == tab["disk_signature"]):
+            state["large"] = False
+        else:
+            text = editor.get("1.0", "end-1c")
+            state.update(compressed=zlib.compress(text.encode("utf-8", "surrogatepass"), 1),
+                         encoding=editor.encoding, newline=editor.newline, modified=editor.is_modified)
+        # 版はエディタを作り直すと数え直すので、読み込み・保存時の版は持ち越さない
+        tab.pop("clean_version", None)
+        del tab["editor"]
+        editor.destroy()
+        tab["pending"] = state
+        # 検索の索引とプレビューはエディタの id と版で覚えているので、作り直したエディタと取り違えないようにする
+        self.search_engine.invalidate()
+        if self._preview_key and self._preview_key[0] == tab_id: self._preview_key = None
+        if self._preview_pending_key and self._preview_pending_key[0] == tab_id: self._preview_pending_key = None
+
+    def _restore_view_state(self, tab_id, state):
+        """セッションに保存していたカーソル位置と表示位置 (先頭行) を戻す"""
+        tab = self.tabs.get(tab_id)
+        if tab is None: return
+        widget = tab["editor"].textbox._textbox
+        caret_line, caret_col = state.get("caret", [1, 0])
+        top = state.get("top", caret_line)
+        if "large_file" in tab:
+            # 大容量ファイルビューはファイル全体の行番号で保存している
+            view = tab["large_file"]
+            view.show_line(top - 1)
+            widget.mark_set("insert", view.to_index(caret_line - 1, caret_col))
+        else:
+            widget.mark_set("insert", f"{caret_line}.{caret_col}")
+            widget.yview(f"{top}.0")
+        tab["editor"].scheduler.mark("current_line", "gutter", "status")
+
+    def _on_view_change(self, tab_id):
+        """表示範囲が変わったとき (スクロールなど)"""
+        tab = self.tabs.get(tab_id)
+        if tab is None: return
+        # 大容量ファイルビューは表示位置に合わせて読み込む範囲をずらす
+        if "large_file" in tab: tab["large_file"].on_view_change()
+        self._on_search_view_change(tab_id)
+
     def _mark_as_modified(self, tab_id):
         info = self.tabs[tab_id]
         if not info["btn"].cget("text").endswith("*"):
@@ -16,6 +16,14 @@ a = Analysis(
         'packaging',
         'config',
         'ui_components',
+        'syntax',
+        'search_engine',
+        'folder_search',
+        'preview',
+        'file_io',
+        'preview_server',
+        'large_file',
+        'recovery',
         'mixins',
         'mixins.tab_operations',
         'mixins.file_operations',
@@ -23,6 +31,9 @@ a = Analysis(
         'mixins.settings_operations',
         'mixins.markdown_operations',
         'mixins.import_operations',
+        'mixins.global_search_operations',
+        'mixins.recovery_operations',
+        'mixins.session_operations',
     ],
     hookspath=[],
     hooksconfig={},
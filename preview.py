@@ -0,0 +1,276 @@
+import hashlib
+import queue
+import re
+import threading
+from collections import OrderedDict
+
+import markdown2
+
+# ==========================================
+# Markdown プレビューの描画 (ブロック単位のキャッシュ付き)
+# ==========================================
+MARKDOWN_EXTRAS = ["fenced-code-blocks", "tables", "task_lists"]
+
+# 数式・化学式 ($$, $, \begin{}, \ce{}) は Markdown 変換から保護して MathJax に任せる
+_MATH = re.compile(r'(\$\$.*?\$\$|\\begin\{.*?\}.*?\\end\{.*?\}|\\ce\{.*?\}|\$.*?\$)', re.DOTALL)
+_FENCE = re.compile(r"^\s{0,3}(`{3,}|~{3,})")
+_HEADING = re.compile(r"^\s{0,3}#{1,6}(\s|$)")
+_LIST_ITEM = re.compile(r"^\s{0,3}(?:[-*+]|\d+[.)])\s")
+# markdown2 がそのまま出力する HTML ブロックの開始タグ (閉じタグまでは空行を挟んでも1つのブロック)
+_HTML_BLOCK_START = re.compile(r"^<(p|div|h[1-6]|blockquote|pre|table|dl|ol|ul|script|noscript|form|fieldset|iframe|math|ins|del"
+                               r"|style|article|aside|header|hgroup|footer|nav|section|figure|figcaption)\b", re.IGNORECASE)
+# 参照形式のリンク定義は文書全体で共有されるので、あればブロック分割しない
+_LINK_DEFINITION = re.compile(r"^\s{0,3}\[[^\]]+\]:\s", re.MULTILINE)
+
+
+def render_block(text):
+    """1ブロック分の Markdown を HTML に変換する"""
+    math_blocks = []
+    def save_math(match):
+        placeholder = f"@@MATH{len(math_blocks)}@@"
+        math_blocks.append(match.group(0))
+        return placeholder
+
+    html = markdown2.markdown(_MATH.sub(save_math, text), extras=MARKDOWN_EXTRAS)
+    # 保護していた数式を復元
+    for i, block in enumerate(math_blocks):
+        html = html.replace(f"@@MATH{i}@@", block)
+    return html
+
+
+def split_blocks(text):
+    """トップレベルのブロック (見出し・段落・コード・表・数式など) に分割する
+
+    [(開始行, 終了行, ブロックの文字列), ...] を返す。行は 0 始まりで終了行は含まない。
+    """
+    lines = text.split("\n")
+    if _LINK_DEFINITION.search(text):
+        return [(0, len(lines), text)]
+
+    blocks = []
+    i, n = 0, len(lines)
+    while i < n:
+        line = lines[i]
+        if not line.strip():
+            i += 1
+            continue
+        start = i
+        fence = _FENCE.match(line)
+        html_block = _HTML_BLOCK_START.match(line)
+        if html_block:
+            # 同じタグの入れ子を数えて、閉じタグの行までを1ブロックにする (閉じていなければ末尾まで)
+            tag = html_block.group(1)
+            opener = re.compile(rf"<{tag}\b", re.IGNORECASE)
+            closer = re.compile(rf"</{tag}\s*>", re.IGNORECASE)
+            depth = 0
+            while i < n:
+                depth += len(opener.findall(lines[i])) - len(closer.findall(lines[i]))
+                i += 1
+                if depth <= 0: break
+        elif fence:
+            # 閉じるまでを1ブロックにする (閉じていなければ末尾まで)
+            marker = fence.group(1)
+            i += 1
+            while i < n and not lines[i].strip().startswith(marker):
+                i += 1
+            i = min(i + 1, n)
+        elif line.strip().startswith("$$") and line.strip().count("$$") == 1:
+            i += 1
+            while i < n and "$$" not in lines[i]:
+                i += 1
+            i = min(i + 1, n)
+        elif line.lstrip().startswith("\\begin{"):
+            while i < n and "\\end{" not in lines[i]:
+                i += 1
+            i = min(i + 1, n)
+        elif _HEADING.match(line):
+            i += 1
+        else:
+            i += 1
+            while i < n and lines[i].strip() and not _FENCE.match(lines[i]) and not _HEADING.match(lines[i]):
+                i += 1
+
+        # 字下げで始まるブロック (リストの続きなど) と、リストに続くリストは前のブロックにつなげる
+        if blocks and (line[:1] in (" ", "\t") or (_LIST_ITEM.match(line) and _LIST_ITEM.match(blocks[-1][2]))):
+            prev_start = blocks.pop()[0]
+            start = prev_start
+        blocks.append((start, i, "\n".join(lines[start:i])))
+    return blocks
+
+
+def join_blocks(blocks):
+    """各ブロックを元の行範囲を持つ要素で包んでつなげる (差分更新とカーソル追従の目印になる)"""
+    return "\n".join(f'<div class="md-block" data-line="{start}" data-end="{end}" data-key="{key}">{html}</div>'
+                     for start, end, key, html in blocks)
+
+
+class MarkdownRenderer:
+    """ブロックごとに変換結果を LRU でキャッシュし、変更のあったブロックだけを変換する"""
+    CACHE_SIZE = 4096
+
+    def __init__(self, cache_size=None):
+        self.cache_size = cache_size or self.CACHE_SIZE
+        self._cache = OrderedDict()
+
+    def render_blocks(self, text):
+        """[(開始行, 終了行, キー, HTML), ...] を返す。行はエディタと同じ 1 始まりで終了行は含まない
+
+        キーはブロックの内容から決まるので、プレビュー側は同じキーの要素をそのまま使い回せる。
+        """
+        result = []
+        cache = self._cache
+        for start, end, block in split_blocks(text):
+            entry = cache.get(block)
+            if entry is None:
+                entry = (hashlib.sha1(block.encode("utf-8")).hexdigest()[:16], render_block(block))
+                cache[block] = entry
+                if len(cache) > self.cache_size:
+                    cache.popitem(last=False)
+            else:
+                cache.move_to_end(block)
+            result.append((start + 1, end + 1, *entry))
+        return result
+
+    def render(self, text):
+        return join_blocks(self.render_blocks(text))
+
+    def clear(self):
+        self._cache.clear()
+
+
+# プレビューサーバー用のスクリプト
+# patch: 変わったブロックだけを DOM に差し込み、その部分だけ MathJax で組版する
+# caret: エディタのカーソル行を含むブロックまでスクロールする
+# reload: テーマ等ページ全体が変わったときだけ再読み込みする
+_LIVE_SCRIPT = """
+            const events = new EventSource('/__events__?v=__VERSION__');
+            events.addEventListener('reload', () => location.reload());
+            events.addEventListener('patch', () => {
+                fetch('/__blocks__', { cache: 'no-store' }).then(r => r.json()).then(patchBlocks);
+            });
+            events.addEventListener('caret', e => followCaret(parseInt(e.data)));
+
+            function patchBlocks(blocks) {
+                const root = document.getElementById('md-root');
+                const pool = new Map();
+                for (const el of Array.from(root.children)) {
+                    if (!pool.has(el.dataset.key)) pool.set(el.dataset.key, []);
+                    pool.get(el.dataset.key).push(el);
+                }
+                const fresh = [];
+                let prev = null;
+                for (const b of blocks) {
+                    let el = (pool.get(b.key) || []).shift();
+                    if (!el) {
+                        el = document.createElement('div');
+                        el.className = 'md-block';
+                        el.dataset.key = b.key;
+                        el.innerHTML = b.html;
+                        fresh.push(el);
+                    }
+                    el.dataset.line = b.line;
+                    el.dataset.end = b.end;
+                    const next = prev ? prev.nextSibling : root.firstChild;
+                    if (el !== next) root.insertBefore(el, next);
+                    prev = el;
+                }
+                for (const els of pool.values()) els.forEach(el => el.remove());
+                if (fresh.length && window.MathJax && MathJax.typesetPromise) MathJax.typesetPromise(fresh);
+            }
+
+            function followCaret(line) {
+                const blocks = document.getElementById('md-root').children;
+                let lo = 0, hi = blocks.length - 1, found = null;
+                while (lo <= hi) {
+                    const mid = (lo + hi) >> 1;
+                    if (parseInt(blocks[mid].dataset.line) <= line) { found = blocks[mid]; lo = mid + 1; } else { hi = mid - 1; }
+                }
+                if (found) found.scrollIntoView({ block: 'center', behavior: 'smooth' });
+            }
+"""
+
+
+def build_page(html_body, base_tag="", is_dark=False, interval_sec=5, version=None):
+    """プレビュー用の HTML ページ全体を組み立てる
+
+    version を指定するとプレビューサーバー用のページになり、定期リロードの代わりに
+    サーバーからの通知 (Server-Sent Events) を受けたときだけ変わったブロックを差し替える。
+    """
+    # UI設定に基づいた配色
+    bg_color = "#1a1a1a" if is_dark else "white"
+    text_color = "#e0e0e0" if is_dark else "black"
+    border_color = "#444" if is_dark else "#ccc"
+    header_bg = "#333" if is_dark else "#f5f5f5"
+
+    if version is None:
+        # ブラウザ側のリロード間隔も設定値に同期
+        reload_script = f"setInterval(() => {{ location.reload(); }}, {interval_sec * 1000});"
+    else:
+        # 新しい版ができたときだけサーバーから通知が届く。本文は変わったブロックだけを差し替える
+        reload_script = _LIVE_SCRIPT.replace("__VERSION__", str(version))
+
+    return f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="utf-8">
+        {base_tag}
+        <script>
+            {reload_script}
+            
+            // スクロール位置の維持ロジック (UX向上)
+            window.onbeforeunload = function() {{ localStorage.setItem('scrollPos', window.scrollY); }};
+            window.onload = function() {{
+                if (localStorage.getItem('scrollPos')) 
+                    window.scrollTo(0, parseInt(localStorage.getItem('scrollPos')));
+            }};
+            
+            window.MathJax = {{
+              tex: {{
+                inlineMath: [['$', '$'], ['\\\\(', '\\\\)']],
+                displayMath: [['$$', '$$'], ['\\\\[', '\\\\]']],
+                processEscapes: true
+              }},
+              loader: {{ load: ['[tex]/mhchem'] }}
+            }};
+        </script>
+        <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js"></script>
+        <style>
+            body {{ background-color: {bg_color}; color: {text_color}; font-family: sans-serif; line-height: 1.7; max-width: 850px; margin: 0 auto; padding: 40px; }}
+            h1 {{ border-bottom: 2px solid #569CD6; padding-bottom: 10px; }}
+            pre {{ background: #2b2b2b; color: #f8f8f2; padding: 15px; border-radius: 8px; overflow-x: auto; }}
+            table {{ border-collapse: collapse; width: 100%; margin: 20px 0; border: 1px solid {border_color}; }}
+            th, td {{ border: 1px solid {border_color}; padding: 12px; text-align: left; }}
+            th {{ background-color: {header_bg}; font-weight: bold; }}
+            tr:nth-child(even) {{ background-color: rgba(128,128,128,0.05); }}
+            img {{ max-width: 100%; height: auto; border-radius: 4px; }}
+            .MathJax {{ font-size: 1.1em !important; }}
+        </style>
+    </head>
+    <body><div id="md-root">{html_body}</div></body>
+    </html>
+    """
+
+
+class PreviewWorker:
+    """プレビューの変換と書き込みを行うバックグラウンドスレッド"""
+    _instance = None
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+
+    @classmethod
+    def submit(cls, job):
+        if cls._instance is None:
+            cls._instance = cls()
+        cls._instance.jobs.put(job)
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                job()
+            except Exception as e:
+                print(f"プレビュー生成エラー: {e}")
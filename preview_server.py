@@ -0,0 +1,224 @@
+import json
+import mimetypes
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+# ==========================================
+# ローカルプレビューサーバー (Server-Sent Events でライブリロード)
+# ==========================================
+EVENTS_PATH = "/__events__"
+BLOCKS_PATH = "/__blocks__"
+# 接続が切れていないか確かめるための空イベントの間隔 (秒)
+KEEPALIVE_SEC = 15
+
+
+def _normalize(path):
+    return os.path.normcase(os.path.realpath(path))
+
+
+def _is_inside(parent, path):
+    try:
+        return os.path.commonpath([parent, path]) == parent
+    except ValueError:
+        return False
+
+
+def _static_root(base_dir, root_dir):
+    """静的ファイルを配信するフォルダと、ページの URL 上での文書のフォルダ ("/" で始まり "/" で終わる)
+
+    文書が root_dir (ノートのフォルダ) の中にあれば root_dir 全体を配信し、ページに文書のフォルダを指す
+    <base> を付ける。こうすると ../img/x.png のような root_dir 内の別のフォルダへの相対パスも読み込める。
+    """
+    if not base_dir: return None, "/"
+    base_dir = os.path.abspath(base_dir)
+    if root_dir:
+        root_dir = os.path.abspath(root_dir)
+        if _is_inside(root_dir, base_dir):
+            rel = os.path.relpath(base_dir, root_dir).replace(os.sep, "/")
+            return root_dir, "/" if rel == "." else f"/{quote(rel)}/"
+    return base_dir, "/"
+
+
+class PreviewServer:
+    """最新のプレビューページを localhost で配信し、新しい描画があったときだけブラウザへ通知する
+
+    ページ以外のパスはノートのフォルダ (文書がその外にあれば文書のフォルダ) から配信するので、
+    相対パスの画像なども読み込める。private_paths (アプリ内部のファイルやフォルダ) と、
+    "." で始まる名前のファイル・フォルダは配信しない。
+    """
+    def __init__(self, private_paths=()):
+        self.private_paths = [_normalize(path) for path in private_paths]
+        self._httpd = None
+        self._cond = threading.Condition()
+        self._page = b""
+        self._blocks = b"[]"
+        self._version = 0
+        # この版より前のページはブロックの差し替えでは追いつけない (テーマ変更など)
+        self._reload_version = 0
+        self._shell_key = None
+        self._caret = 0
+        self._caret_seq = 0
+        self.static_root = None
+        # ページの URL 上での文書のフォルダ (ページ内のリンク #... の移動先になるので、ここでもページを返す)
+        self.page_path = "/"
+
+    @property
+    def running(self):
+        return self._httpd is not None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        if self._httpd is None:
+            self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _PreviewHandler)
+            self._httpd.daemon_threads = True
+            self._httpd.preview = self
+            threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        if self._httpd is None: return
+        httpd, self._httpd = self._httpd, None
+        # 待機中のイベント配信を起こして終了させる
+        with self._cond:
+            self._cond.notify_all()
+        httpd.shutdown()
+        httpd.server_close()
+
+    def publish(self, build, blocks=(), base_dir=None, shell_key=None, root_dir=None):
+        """build(version, base_tag) が返すページを新しい版として公開し、接続中のブラウザに通知する
+
+        blocks は MarkdownRenderer.render_blocks の結果で、ブラウザはこれを使って本文を差分更新する。
+        shell_key (テーマなど本文以外の部分) や文書のフォルダが変わったときはページ全体を再読み込みさせる。
+        相対パスは base_dir (文書のフォルダ) から解決し、root_dir の中なら root_dir 内を参照できる。
+        """
+        blocks = json.dumps([{"line": start, "end": end, "key": key, "html": html} for start, end, key, html in blocks])
+        static_root, page_path = _static_root(base_dir, root_dir)
+        base_tag = "" if page_path == "/" else f'<base href="{page_path}">'
+        with self._cond:
+            version = self._version + 1
+            self._page = build(version, base_tag).encode("utf-8")
+            self._blocks = blocks.encode("utf-8")
+            self._version = version
+            if (shell_key, base_tag) != self._shell_key:
+                self._shell_key = (shell_key, base_tag)
+                self._reload_version = version
+            self.static_root = static_root
+            self.page_path = page_path
+            self._cond.notify_all()
+
+    def set_caret(self, line):
+        """エディタのカーソル行を通知する (プレビューがその位置までスクロールする)"""
+        with self._cond:
+            if line == self._caret: return
+            self._caret = line
+            self._caret_seq += 1
+            self._cond.notify_all()
+
+    def wait_for_event(self, version, caret_seq, timeout):
+        """新しい版かカーソル移動があるまで待つ
+
+        (最新の版, 再読み込みが必要な版, カーソル行, カーソルの通番) を返す。何もなければ None。
+        """
+        def changed():
+            return self._version > version or self._caret_seq != caret_seq
+        with self._cond:
+            self._cond.wait_for(lambda: changed() or self._httpd is None, timeout)
+            if not changed(): return None
+            return self._version, self._reload_version, self._caret, self._caret_seq
+
+
+class _PreviewHandler(BaseHTTPRequestHandler):
+    def _allowed_host(self):
+        # DNS リバインディングで別のサイトのページから読まれないよう、このサーバーを指す Host だけを受け付ける
+        port = self.server.server_address[1]
+        host = (self.headers.get("Host") or "").lower()
+        return host in (f"127.0.0.1:{port}", f"localhost:{port}")
+
+    def do_GET(self):
+        if not self._allowed_host():
+            self._send(403, "text/plain", b"Forbidden")
+            return
+        preview = self.server.preview
+        parts = urlsplit(self.path)
+        if parts.path in ("/", "/index.html", preview.page_path):
+            with preview._cond:
+                page = preview._page
+            self._send(200, "text/html; charset=utf-8", page)
+        elif parts.path == BLOCKS_PATH:
+            with preview._cond:
+                blocks = preview._blocks
+            self._send(200, "application/json", blocks)
+        elif parts.path == EVENTS_PATH:
+            version = int(parse_qs(parts.query).get("v", ["0"])[0] or 0)
+            self._stream_events(preview, version)
+        else:
+            self._send_static(preview, unquote(parts.path))
+
+    def _stream_events(self, preview, version):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        with preview._cond:
+            # 接続前のカーソル移動は送らない
+            caret_seq = preview._caret_seq
+        try:
+            while preview.running:
+                event = preview.wait_for_event(version, caret_seq, KEEPALIVE_SEC)
+                if event is None:
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    latest, reload_version, caret, latest_caret_seq = event
+                    if latest > version:
+                        name = "reload" if reload_version > version else "patch"
+                        self.wfile.write(f"event: {name}\ndata: {latest}\n\n".encode("ascii"))
+                        version = latest
+                    if latest_caret_seq != caret_seq:
+                        self.wfile.write(f"event: caret\ndata: {caret}\n\n".encode("ascii"))
+                        caret_seq = latest_caret_seq
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+            pass
+
+    def _send_static(self, preview, path):
+        base_dir = preview.static_root
+        if not base_dir:
+            self._send(404, "text/plain", b"Not Found")
+            return
+        file_path = os.path.abspath(os.path.join(base_dir, path.lstrip("/")))
+        real_path = _normalize(file_path)
+        # 配信するフォルダの外と、アプリ内部のファイル (復旧ジャーナル・セッション・設定) や隠しファイルは配信しない
+        inside = _is_inside(_normalize(base_dir), real_path)
+        private = (any(_is_inside(private, real_path) for private in preview.private_paths)
+                   or any(part.startswith(".") for part in os.path.relpath(file_path, base_dir).split(os.sep)))
+        if not inside or private or not os.path.isfile(file_path):
+            self._send(404, "text/plain", b"Not Found")
+            return
+        try:
+            with open(file_path, "rb") as f:
+                body = f.read()
+        except OSError:
+            self._send(404, "text/plain", b"Not Found")
+            return
+        self._send(200, mimetypes.guess_type(file_path)[0] or "application/octet-stream", body)
+
+    def _send(self, status, content_type, body):
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+            pass
+
+    def log_message(self, format, *args):
+        # アクセスログはコンソールに出さない
+        pass
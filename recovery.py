@@ -0,0 +1,239 @@
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+from file_io import read_text, write_text_atomic
+
+# ==========================================
+# クラッシュ復旧用ジャーナル (タブごとの編集差分を追記する)
+# ==========================================
+# ジャーナルのファイル構成: recovery/<セッション>/<タブ>.journal
+#   1行目: メタ情報 {"name", "path", "encoding", "newline", "base"}
+#   2行目: 内容の写し ["snap", 文字列] (base が元のファイルを指すときは省略)
+#   以降 : 編集差分 [行, 列, 終了行, 終了列, 文字列] (Tk の位置で「範囲を文字列に置き換える」)
+RECOVERY_DIR_NAME = "recovery"
+HEARTBEAT_NAME = "heartbeat"
+# 生存確認ファイルを更新する間隔と、これより古いセッションをクラッシュしたとみなす時間 (秒)
+HEARTBEAT_SEC = 5
+STALE_SEC = 30
+# 差分がこの大きさ (文字数) と文書の大きさの半分の両方を超えたら写しに置き換える
+COMPACT_MIN_CHARS = 1024 * 1024
+
+
+def file_signature(path):
+    """元のファイルが変わっていないか確かめるための (大きさ, 更新時刻)"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+class RecoveryJournal:
+    """編集差分をメモリにためておき、flush() のたびにワーカースレッドでジャーナルへ追記する
+
+    書き込み量は入力量に比例し、文書全体を書き出すのは書き始めと圧縮 (compact) のときだけ。
+    """
+    def __init__(self, root):
+        self.root = root
+        self.directory = os.path.join(root, f"{os.getpid()}-{int(time.time())}")
+        self._pending = {}
+        self._delta_chars = {}
+        self._jobs = queue.Queue()
+        self._closed = False
+        os.makedirs(self.directory, exist_ok=True)
+        self._touch()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def __contains__(self, key):
+        return key in self._delta_chars
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.journal")
+
+    def start(self, key, meta, text=None):
+        """ジャーナルを新しく書き始める。text を省略すると meta["path"] のファイルを元の内容とする"""
+        self._pending.pop(key, None)
+        self._delta_chars[key] = 0
+        lines = [json.dumps(meta, ensure_ascii=False)]
+        if text is not None:
+            lines.append(json.dumps(["snap", text], ensure_ascii=False))
+        self._jobs.put(("write", key, "\n".join(lines) + "\n"))
+
+    def record(self, key, line, col, end_line, end_col, text):
+        """1回の編集 ([line.col, end_line.end_col) を text に置き換える) を記録する"""
+        self._pending.setdefault(key, []).append(
+            json.dumps([line, col, end_line, end_col, text], ensure_ascii=False))
+        self._delta_chars[key] += len(text) + 16
+
+    def needs_compaction(self, key, document_chars):
+        chars = self._delta_chars.get(key, 0)
+        return chars > COMPACT_MIN_CHARS and chars > document_chars // 2
+
+    def discard(self, key):
+        """保存済み・閉じたタブのジャーナルを消す"""
+        self._pending.pop(key, None)
+        if self._delta_chars.pop(key, None) is not None:
+            self._jobs.put(("remove", key, None))
+
+    def flush(self):
+        """ためた差分をワーカーに渡す (UI スレッドから定期的に呼ぶ)"""
+        pending, self._pending = self._pending, {}
+        for key, lines in pending.items():
+            self._jobs.put(("append", key, "\n".join(lines) + "\n"))
+
+    def close(self):
+        """正常終了時に呼ぶ。書き込みを終えてからセッションのジャーナルを削除する"""
+        self._pending.clear()
+        self._jobs.put(("close", None, None))
+        self._jobs.join()
+
+    def _touch(self):
+        with open(os.path.join(self.directory, HEARTBEAT_NAME), "w"):
+            pass
+
+    def _run(self):
+        last_touch = time.monotonic()
+        while True:
+            try:
+                kind, key, data = self._jobs.get(timeout=max(0, HEARTBEAT_SEC - (time.monotonic() - last_touch)))
+            except queue.Empty:
+                kind = None
+            try:
+                # 書き込みが続いていてもいなくても、一定時間ごとに生きていることを他のインスタンスに示す
+                if not self._closed and time.monotonic() - last_touch >= HEARTBEAT_SEC:
+                    last_touch = time.monotonic()
+                    self._touch()
+                if kind is None or self._closed:
+                    pass
+                elif kind == "write":
+                    write_text_atomic(self._path(key), data)
+                elif kind == "append":
+                    with open(self._path(key), "a", encoding="utf-8", newline="\n") as f:
+                        f.write(data)
+                elif kind == "remove":
+                    if os.path.exists(self._path(key)): os.remove(self._path(key))
+                elif kind == "close":
+                    self._closed = True
+                    shutil.rmtree(self.directory, ignore_errors=True)
+            except Exception as e:
+                print(f"復旧ジャーナル書き込みエラー: {e}")
+            finally:
+                if kind is not None: self._jobs.task_done()
+
+
+def apply_edit(lines, line, col, end_line, end_col, text):
+    """行のリストに1回の編集を適用する"""
+    head = lines[line - 1][:col]
+    tail = lines[end_line - 1][end_col:]
+    lines[line - 1:end_line] = (head + text + tail).split("\n")
+
+
+def replay(path):
+    """ジャーナルから内容を復元し (メタ情報, 文字列) を返す。元の内容が得られなければ None"""
+    with open(path, "r", encoding="utf-8") as f:
+        records = f.read().split("\n")
+    try:
+        meta = json.loads(records[0])
+    except ValueError:
+        return None
+    start = 1
+    if len(records) > 1 and records[1].startswith('["snap",'):
+        text = json.loads(records[1])[1]
+        start = 2
+    else:
+        # 元のファイルが書き始めたときのままでなければ、差分を当てられない
+        if not meta.get("path") or file_signature(meta["path"]) != meta.get("base"): return None
+        text = read_text(meta["path"])[0]
+    lines = text.split("\n")
+    for record in records[start:]:
+        if not record: continue
+        try:
+            apply_edit(lines, *json.loads(record))
+        except (ValueError, TypeError, IndexError):
+            # クラッシュ時に書きかけだった最後の行などは無視する
+            break
+    return meta, "\n".join(lines)
+
+
+def _process_alive(pid):
+    """pid のプロセスが動いているか (確かめられなければ動いているとみなす)"""
+    if pid == os.getpid(): return True
+    if os.name == "nt":
+        # Windows の os.kill はプロセスを終了させてしまうので使わない
+        import ctypes
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        # 開けないのは、存在しないか (ERROR_INVALID_PARAMETER) 権限がないとき
+        if not handle: return ctypes.get_last_error() != 87
+        try:
+            code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)): return True
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def find_crashed_sessions(root):
+    """生存確認が途絶えたセッションのフォルダを返す (正常終了したセッションは削除済み)
+
+    フォルダ名の pid のプロセスがまだ動いていれば、生存確認が遅れているだけとみなして除く。
+    """
+    if not os.path.isdir(root): return []
+    sessions = []
+    now = time.time()
+    for name in sorted(os.listdir(root)):
+        directory = os.path.join(root, name)
+        heartbeat = os.path.join(directory, HEARTBEAT_NAME)
+        try:
+            if now - os.path.getmtime(heartbeat) < STALE_SEC: continue
+        except OSError:
+            pass
+        pid = name.split("-")[0]
+        if pid.isdigit() and _process_alive(int(pid)): continue
+        if os.path.isdir(directory): sessions.append(directory)
+    return sessions
+
+
+def _journal_label(path):
+    """ジャーナルのタブの表示名 (メタ情報を読めなければファイル名)"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            meta = json.loads(f.readline())
+        return meta.get("path") or meta.get("name") or os.path.basename(path)
+    except (OSError, ValueError, AttributeError):
+        return os.path.basename(path)
+
+
+def load_crashed(root):
+    """クラッシュしたセッションを調べ (セッションのフォルダ一覧, 復元できるタブ, 復元できないタブ) を返す
+
+    復元できるタブは [(メタ情報, 文字列, ジャーナルのパス), ...]、復元できないタブ (元のファイルが
+    書き始めたときから変わっているなど) は [(表示名, ジャーナルのパス), ...]。
+    """
+    sessions = find_crashed_sessions(root)
+    entries, failed = [], []
+    for directory in sessions:
+        # tab_2 が tab_10 より先になるよう、名前の長さ→名前の順に並べる
+        for name in sorted(os.listdir(directory), key=lambda n: (len(n), n)):
+            if not name.endswith(".journal"): continue
+            path = os.path.join(directory, name)
+            try:
+                entry = replay(path)
+            except OSError:
+                entry = None
+            if entry:
+                entries.append(entry + (path,))
+            else:
+                failed.append((_journal_label(path), path))
+    return sessions, entries, failed
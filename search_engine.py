@@ -0,0 +1,138 @@
+import re
+from bisect import bisect_left, bisect_right
+
+from syntax import line_starts
+
+# ==========================================
+# 検索エンジン (正規表現 / 単語単位 / 大文字小文字)
+# ==========================================
+def compile_query(query, regex=False, whole_word=False, case_sensitive=False):
+    """検索条件を正規表現にコンパイルする。不正な正規表現は re.error を送出する"""
+    pattern = query if regex else re.escape(query)
+    if whole_word:
+        pattern = rf"\b(?:{pattern})\b"
+    return re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+
+
+def offset_to_index(starts, offset):
+    """行頭オフセット表を使って 文字オフセット -> Tk の 行.列 に変換する"""
+    line = bisect_right(starts, offset) - 1
+    return f"{line + 1}.{offset - starts[line]}"
+
+
+class MatchIndex:
+    """1つのテキストに対する一致位置の索引。開始オフセット順に並んでいる"""
+    def __init__(self, pattern, text):
+        self.starts = []
+        self.ends = []
+        for match in pattern.finditer(text):
+            s, e = match.span()
+            # 空文字に一致する位置 (^ や \b など) は移動・強調の対象にしない
+            if s == e: continue
+            self.starts.append(s)
+            self.ends.append(e)
+        self.line_starts = line_starts(text)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def to_index(self, offset):
+        """文字オフセット -> Tk の 行.列"""
+        return offset_to_index(self.line_starts, offset)
+
+    def to_offset(self, index):
+        """Tk の 行.列 -> 文字オフセット"""
+        line, col = map(int, str(index).split("."))
+        line = min(max(line, 1), len(self.line_starts))
+        return self.line_starts[line - 1] + col
+
+    def next_after(self, offset):
+        """offset より後ろで始まる最初の一致の番号 (末尾を越えたら先頭へ戻る)"""
+        if not self.starts: return None
+        i = bisect_right(self.starts, offset)
+        return i if i < len(self.starts) else 0
+
+    def prev_before(self, offset):
+        """offset より前で始まる最後の一致の番号 (先頭を越えたら末尾へ戻る)"""
+        if not self.starts: return None
+        i = bisect_left(self.starts, offset) - 1
+        return i if i >= 0 else len(self.starts) - 1
+
+    def position_of(self, offset):
+        """offset から始まる一致の番号。なければ None"""
+        i = bisect_left(self.starts, offset)
+        if i < len(self.starts) and self.starts[i] == offset: return i
+        return None
+
+    def between_lines(self, first, last, limit):
+        """first 行から last 行までにある一致を最大 limit 件、(開始, 終了) の Tk インデックスで返す"""
+        lo = self.line_starts[min(max(first, 1), len(self.line_starts)) - 1]
+        hi = self.line_starts[last] if last < len(self.line_starts) else float("inf")
+        # 前の行から続く一致も表示範囲に掛かるので終了位置で探し始める
+        i = bisect_right(self.ends, lo)
+        result = []
+        while i < len(self.starts) and self.starts[i] < hi and len(result) < limit:
+            result.append((self.to_index(self.starts[i]), self.to_index(self.ends[i])))
+            i += 1
+        return result
+
+
+class SearchEngine:
+    """(検索条件, 文書バージョン) ごとに索引を1度だけ作り、以後は使い回す"""
+    def __init__(self):
+        self._key = None
+        self._index = None
+
+    def index_for(self, editor, query, regex=False, whole_word=False, case_sensitive=False):
+        if not query: return None
+        key = (id(editor), editor.version, query, regex, whole_word, case_sensitive)
+        if key != self._key:
+            pattern = compile_query(query, regex, whole_word, case_sensitive)
+            self._index = MatchIndex(pattern, editor.get("1.0", "end-1c"))
+            self._key = key
+        return self._index
+
+    def invalidate(self):
+        self._key = None
+        self._index = None
+
+
+def iter_line_matches(pattern, text):
+    """一致ごとに (行, 列, 終了行, 終了列, 行の文字列) を返す。行は 1 始まり"""
+    starts = line_starts(text)
+    for match in pattern.finditer(text):
+        s, e = match.span()
+        if s == e: continue
+        line = bisect_right(starts, s) - 1
+        end_line = bisect_right(starts, e) - 1
+        line_end = text.find("\n", s)
+        if line_end < 0: line_end = len(text)
+        yield line + 1, s - starts[line], end_line + 1, e - starts[end_line], text[starts[line]:line_end]
+
+
+def expand_match(match, replacement, regex=False):
+    """置換後の文字列。正規表現モードでは \\1 や \\g<name> を展開する"""
+    return match.expand(replacement) if regex else replacement
+
+
+def replace_all(pattern, text, replacement, regex=False):
+    """全ての一致を置換し、変更が及ぶ最小の範囲だけを返す
+
+    (開始オフセット, 終了オフセット, その範囲の置換後の文字列, 置換数) を返す。一致がなければ None。
+    最初の一致より前と最後の一致より後ろは変わらないので、呼び出し側は1回の置き換えで反映できる。
+    """
+    span = [None, None, 0]
+
+    def substitute(match):
+        s, e = match.span()
+        # 空文字への一致は検索結果と同じく対象外にする
+        if s == e: return ""
+        if span[0] is None: span[0] = s
+        span[1] = e
+        span[2] += 1
+        return expand_match(match, replacement, regex)
+
+    new_text = pattern.sub(substitute, text)
+    start, end, count = span
+    if not count: return None
+    return start, end, new_text[start:len(new_text) - (len(text) - end)], count
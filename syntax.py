@@ -0,0 +1,223 @@
+import os
+import re
+from bisect import bisect_right
+try:
+    from re import _constants as _sre, _parser as _sre_parse
+except ImportError:  # Python 3.10 以前
+    import sre_constants as _sre, sre_parse as _sre_parse
+
+# 文字クラスに書けるカテゴリ (\w 等)
+_CATEGORIES = {_sre.CATEGORY_WORD: r"\w", _sre.CATEGORY_DIGIT: r"\d", _sre.CATEGORY_SPACE: r"\s"}
+_REPEATS = tuple(op for op in (_sre.MAX_REPEAT, _sre.MIN_REPEAT, getattr(_sre, "POSSESSIVE_REPEAT", None)) if op is not None)
+
+
+def _first_chars(items):
+    """正規表現の構文木で、一致の最初の文字になりうる文字 (文字クラスの部品の集合) と、空文字列に一致しうるかを返す
+
+    調べられない構文 (任意の文字・否定の文字クラス・大文字小文字の無視など) があれば None。
+    """
+    chars = set()
+    for op, av in items:
+        # 幅のない条件 (\b, ^, 先読み・後読み) は読み飛ばす
+        if op is _sre.AT or op is _sre.ASSERT or op is _sre.ASSERT_NOT: continue
+        if op is _sre.LITERAL:
+            chars.add(re.escape(chr(av)))
+            return chars, False
+        if op is _sre.IN:
+            for item_op, item_av in av:
+                if item_op is _sre.LITERAL:
+                    chars.add(re.escape(chr(item_av)))
+                elif item_op is _sre.RANGE:
+                    chars.add(f"{re.escape(chr(item_av[0]))}-{re.escape(chr(item_av[1]))}")
+                elif item_op is _sre.CATEGORY and item_av in _CATEGORIES:
+                    chars.add(_CATEGORIES[item_av])
+                else:
+                    return None
+            return chars, False
+        if op is _sre.SUBPATTERN:
+            if av[1] & re.IGNORECASE: return None
+            alternatives, nullable = [av[-1]], False
+        elif op is _sre.BRANCH:
+            alternatives, nullable = av[1], False
+        elif op in _REPEATS:
+            alternatives, nullable = [av[2]], av[0] == 0
+        else:
+            return None
+        for sub in alternatives:
+            result = _first_chars(sub)
+            if result is None: return None
+            chars |= result[0]
+            nullable = nullable or result[1]
+        if not nullable: return chars, False
+    return chars, True
+
+
+def _first_char_class(pattern):
+    """pattern の一致が始まりうる文字の文字クラス。決められなければ None"""
+    parsed = _sre_parse.parse(pattern, re.MULTILINE)
+    if parsed.state.flags & re.IGNORECASE: return None
+    result = _first_chars(parsed)
+    if result is None or result[1]: return None
+    return "[" + "".join(sorted(result[0])) + "]"
+
+# ==========================================
+# シンタックス定義 (Grammar レジストリ)
+# ==========================================
+class Grammar:
+    """言語ごとのハイライト規則。全規則を名前付きグループの1つの正規表現にまとめてコンパイルする
+
+    multiline には複数行にまたがる構文 (tag, 開始, 終了) を指定する。
+    行末でその構文の内側にいる場合、行末状態は「構文の番号 + 1」になる (0 は通常状態)。
+    """
+    def __init__(self, name, rules, extensions=(), multiline=()):
+        self.name = name
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.multiline = tuple(multiline)
+
+        parts = []
+        group_tags = {}
+        group_states = {}
+        # 複数行構文は同じ位置の単一行規則より優先させるため先頭に置く
+        for i, (tag, start, end) in enumerate(self.multiline):
+            group = f"_ml{i}"
+            parts.append(f"(?P<{group}>{re.escape(start)}[\\s\\S]*?(?:{re.escape(end)}|\\Z))")
+            group_tags[group] = tag
+            group_states[group] = i + 1
+        for i, (tag, pattern) in enumerate(rules):
+            # 同じタグの規則が複数あってもグループ名が衝突しないよう連番を付ける
+            group = f"{tag}_{i}"
+            parts.append(f"(?P<{group}>{pattern})")
+            group_tags[group] = tag
+        # 同じ位置で複数の規則が一致する場合は先に書かれた規則が優先される
+        alternation = "|".join(parts)
+        # 一致が始まりうる文字を先読みで確かめ、それ以外の位置では各規則を試さずに進む
+        first = _first_char_class(alternation)
+        self.pattern = re.compile(f"(?={first})(?:{alternation})" if first else alternation, re.MULTILINE)
+        # match.lastindex (規則のグループは内側のグループより後に閉じるので規則の番号になる) で引く表
+        self._group_tags = [None] * (self.pattern.groups + 1)
+        self._group_states = [0] * (self.pattern.groups + 1)
+        for group, index in self.pattern.groupindex.items():
+            self._group_tags[index] = group_tags[group]
+            self._group_states[index] = group_states.get(group, 0)
+
+    def tokenize(self, text, state=0):
+        """複数行のテキストを1回の走査でトークン化する
+
+        state は1行目の直前の状態。各行の [(tag, 開始列, 終了列), ...] と各行末の状態を返す。
+        オフセットは行頭オフセット表で 行.列 に変換するため、Tk 側で相対位置を数え直す必要がない。
+        """
+        starts = line_starts(text)
+        line_spans = [[] for _ in starts]
+        line_states = [0] * len(starts)
+        pos = 0
+        if state > 0:
+            tag, _, end = self.multiline[state - 1]
+            close = text.find(end)
+            pos = len(text) if close < 0 else close + len(end)
+            self._add_multiline(text, starts, line_spans, line_states, tag, 0, pos, state, close >= 0)
+
+        group_tags = self._group_tags
+        group_states = self._group_states
+        # 一致は先頭から順に返るので、行番号は行が変わったときだけ求め直す
+        line, line_start, next_start = 0, 0, -1
+        for match in self.pattern.finditer(text, pos):
+            index = match.lastindex
+            s, e = match.span()
+            if s >= next_start:
+                line = bisect_right(starts, s) - 1
+                line_start = starts[line]
+                next_start = starts[line + 1] if line + 1 < len(starts) else len(text) + 1
+            ml_state = group_states[index]
+            if not ml_state:
+                line_spans[line].append((group_tags[index], s - line_start, e - line_start))
+                continue
+            _, start, end = self.multiline[ml_state - 1]
+            closed = e - s >= len(start) + len(end) and text.endswith(end, s, e)
+            self._add_multiline(text, starts, line_spans, line_states, group_tags[index], s, e, ml_state, closed)
+        return line_spans, line_states
+
+    @staticmethod
+    def _add_multiline(text, starts, line_spans, line_states, tag, s, e, state, closed):
+        """複数行にまたがるトークンを行ごとのスパンに分割し、途中の行末状態を記録する"""
+        first = bisect_right(starts, s) - 1
+        # 閉じていないトークンはテキスト末尾 (最終行が空行でも) まで続く
+        last = bisect_right(starts, max(s, e - 1)) - 1 if closed else len(starts) - 1
+        for line in range(first, last + 1):
+            line_start = starts[line]
+            line_end = starts[line + 1] - 1 if line + 1 < len(starts) else len(text)
+            seg_start, seg_end = max(s, line_start), min(e, line_end)
+            if seg_end > seg_start:
+                line_spans[line].append((tag, seg_start - line_start, seg_end - line_start))
+            if line < last or not closed:
+                line_states[line] = state
+
+
+_NEWLINE = re.compile("\n")
+
+
+def line_starts(text):
+    """各行の先頭オフセットの表"""
+    return [0] + [m.end() for m in _NEWLINE.finditer(text)]
+
+
+_GRAMMARS = {}
+_EXTENSIONS = {}
+
+
+def register_grammar(grammar):
+    """文法を登録する。同名の文法は置き換えられる"""
+    _GRAMMARS[grammar.name] = grammar
+    for ext in grammar.extensions:
+        _EXTENSIONS[ext] = grammar.name
+    return grammar
+
+
+def register_extension(ext, mode):
+    """既存の文法に拡張子を追加で対応付ける (例: register_extension(".pyi", "Python"))"""
+    if mode not in _GRAMMARS:
+        raise KeyError(mode)
+    _EXTENSIONS[ext.lower()] = mode
+
+
+def get_grammar(mode):
+    return _GRAMMARS.get(mode)
+
+
+def mode_for_path(path):
+    if not path: return "Plain Text"
+    ext = os.path.splitext(path)[1].lower()
+    return _EXTENSIONS.get(ext, "Plain Text")
+
+
+register_grammar(Grammar("Python", [
+    ("comment", r"#.*"),
+    ("string", r"\".*?\"|'.*?'"),
+    ("keyword", r"\b(?:def|class|if|else|elif|for|while|return|import|from|as|try|except|with|None|True|False|self|in|is|not|pass|lambda)\b"),
+    ("number", r"\b\d+\b"),
+], extensions=[".py", ".pyw", ".pyi"], multiline=[("string", '"""', '"""'), ("string", "'''", "'''")]))
+
+register_grammar(Grammar("JavaScript", [
+    ("comment", r"//.*"),
+    ("string", r"\".*?\"|'.*?'"),
+    ("keyword", r"\b(?:function|var|let|const|if|else|for|while|return|import|export|class|async|await|new|this|true|false|null)\b"),
+    ("number", r"\b\d+\b"),
+], extensions=[".js", ".mjs", ".cjs", ".jsx"], multiline=[("comment", "/*", "*/"), ("string", "`", "`")]))
+
+register_grammar(Grammar("HTML", [
+    ("tag", r"</?[!a-zA-Z][\w:-]*|/?>"),
+    ("attr", r"\b[a-zA-Z0-9-]+(?==)"),
+    ("string", r"\".*?\"|'.*?'"),
+], extensions=[".html", ".htm", ".xhtml"], multiline=[("comment", "<!--", "-->")]))
+
+register_grammar(Grammar("CSS", [
+    ("string", r"\".*?\"|'.*?'"),
+    ("keyword", r"\b(?:active|hover|focus|visited|link|root|media|import|font-face)\b"),
+    ("attr", r"\b[a-zA-Z-]+(?=:)"),
+], extensions=[".css"], multiline=[("comment", "/*", "*/")]))
+
+register_grammar(Grammar("Markdown", [
+    ("keyword", r"^#+.*$"), # 見出し
+    ("tag", r"`.*?`"), # インラインコード
+    ("string", r"\*\*.*?\*\*|__.*?__"), # 太字
+    ("comment", r"\[.*?\]\(.*?\)"), # リンク
+], extensions=[".md", ".markdown"], multiline=[("tag", "```", "```")]))
@@ -1,15 +1,118 @@
 import customtkinter as ctk
-from tkinter import Canvas
-import os
-import re
+from tkinter import Canvas, Listbox
+import queue
+import threading
+from array import array
 from config import AppConfig
+from syntax import get_grammar, mode_for_path
 
 # ==========================================
 # 3. シンタックスハイライター
 # ==========================================
+class _LineRanges:
+    """1始まりの行範囲 [start, end) を昇順・重複なしで保持する小さな集合"""
+    def __init__(self):
+        self.ranges = []
+
+    def __bool__(self):
+        return bool(self.ranges)
+
+    def clear(self):
+        self.ranges = []
+
+    def add(self, start, end):
+        if start >= end: return
+        kept = []
+        for s, e in self.ranges:
+            if e < start or s > end:
+                kept.append((s, e))
+            else:
+                start, end = min(s, start), max(e, end)
+        kept.append((start, end))
+        kept.sort()
+        self.ranges = kept
+
+    def remove(self, start, end):
+        kept = []
+        for s, e in self.ranges:
+            if e <= start or s >= end:
+                kept.append((s, e))
+                continue
+            if s < start: kept.append((s, start))
+            if e > end: kept.append((end, e))
+        self.ranges = kept
+
+    def splice(self, line, removed, added):
+        """line 行の後ろの removed 行が削除され added 行が挿入された時に行番号を補正する"""
+        def shift(n):
+            if n <= line: return n
+            if n > line + removed: return n + added - removed
+            return line + 1
+        shifted = [(shift(s), shift(e)) for s, e in self.ranges]
+        self.ranges = []
+        for s, e in shifted:
+            self.add(s, e)
+
+    def first(self):
+        return self.ranges[0] if self.ranges else None
+
+    def contains(self, line):
+        return any(s <= line < e for s, e in self.ranges)
+
+    def clip(self, start, end):
+        """[start, end) と重なる部分だけを返す"""
+        return [(max(s, start), min(e, end)) for s, e in self.ranges if s < end and e > start]
+
+
+class _TokenizerWorker:
+    """全エディタで共有するトークナイズ用のバックグラウンドスレッド"""
+    _instance = None
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+
+    @classmethod
+    def submit(cls, job):
+        if cls._instance is None:
+            cls._instance = cls()
+        cls._instance.jobs.put(job)
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                job()
+            except Exception as e:
+                print(f"トークナイズエラー: {e}")
+
+
 class SyntaxHighlighter:
+    # 変更行の後ろに、状態の変化を追うため余分に渡す行数
+    LOOKAHEAD_LINES = 64
+    # 画面外を埋める際、1回のジョブで処理する行数
+    FILL_SLICE_LINES = 400
+    # ワーカーの解析結果を UI スレッドで受け取りに行く間隔
+    RESULT_POLL_MS = 5
+
     def __init__(self, textbox):
         self.textbox = textbox
+        self.mode = None
+        self.grammar = None
+        # 各行末のレキサ状態のチェックポイント (0: 通常, n: 複数行構文の内側, -1: 未解析)
+        self._line_states = array("b")
+        # 再ハイライトが必要な行
+        self._dirty = _LineRanges()
+        # 仮の状態で塗り済みの（まだ未確定の）行
+        self._painted = _LineRanges()
+        # 編集のたびに増える世代番号。古い世代の解析結果は捨てる
+        self._generation = 0
+        self._inflight = False
+        self._closed = False
+        # ワーカーからの解析結果 (Tk はワーカースレッドから呼ばない)
+        self._results = queue.Queue()
+        self._poll_job = None
         self._setup_tags()
 
     def _setup_tags(self):
@@ -20,54 +123,173 @@ class SyntaxHighlighter:
         self.textbox.tag_lower("current_line")
 
     def apply(self, mode):
-        self.clear_syntax()
-        if mode == "Plain Text": return
-        
-        content = self.textbox.get("1.0", "end-1c")
-        
-        rules = []
-        if mode == "Python":
-            rules = [
-                ("keyword", r"\b(def|class|if|else|elif|for|while|return|import|from|as|try|except|with|None|True|False|self|in|is|not|pass|lambda)\b"),
-                ("string", r"(\".*?\"|'.*?')"),
-                ("comment", r"#.*"),
-                ("number", r"\b\d+\b")
-            ]
-        elif mode == "JavaScript":
-            rules = [
-                ("keyword", r"\b(function|var|let|const|if|else|for|while|return|import|export|class|async|await|new|this|true|false|null)\b"),
-                ("string", r"(\".*?\"|'.*?`|`.*?`)"),
-                ("comment", r"//.*|/\*[\s\S]*?\*/"),
-                ("number", r"\b\d+\b")
-            ]
-        elif mode == "HTML":
-            rules = [
-                ("tag", r"<[^>]+>"),
-                ("attr", r"\b[a-zA-Z0-9-]+(?==)"),
-                ("string", r"\".*?\"|'.*?'"),
-                ("comment", r"<!--[\s\S]*?-->")
-            ]
-        elif mode == "CSS":
-            rules = [
-                ("keyword", r"\b(active|hover|focus|visited|link|root|media|import|font-face)\b"),
-                ("attr", r"\b[a-zA-Z-]+(?=:)"),
-                ("string", r"\".*?\"|'.*?'"),
-                ("comment", r"/\*[\s\S]*?\*/")
-            ]
-        elif mode == "Markdown":
-            rules = [
-                ("keyword", r"^(#+.*)$"), # 見出し
-                ("string", r"(\*\*.*?\*\*|__.*?__)"), # 太字
-                ("comment", r"(\[.*?\]\(.*?\))"), # リンク
-                ("tag", r"(`.*?`)"), # インラインコード
-    ]
-            
-
-        for tag, pattern in rules:
-            for match in re.finditer(pattern, content):
-                start = f"1.0+{match.start()}c"
-                end = f"1.0+{match.end()}c"
-                self.textbox.tag_add(tag, start, end)
+        """モードが変わった時は全体を、それ以外は変更のあった行だけを再ハイライトする"""
+        if mode != self.mode:
+            self.mode = mode
+            self.grammar = get_grammar(mode)
+            self._generation += 1
+            self.clear_syntax()
+            self._painted.clear()
+            line_count = self._line_count()
+            self._line_states = array("b", [-1]) * line_count
+            self._dirty.clear()
+            self._dirty.add(1, line_count + 1)
+        if self.grammar is None:
+            self._dirty.clear()
+            return
+        self.highlight_pending()
+
+    def note_edit(self, line, removed, added):
+        """line 行目から removed 行分が added 行分に置き換わったことを記録する"""
+        if self.mode is None: return
+        self._generation += 1
+        states = self._line_states
+        if line - 1 + removed >= len(states):
+            # 行数の整合が取れない場合は全体を再解析する
+            self.mode = None
+            self.grammar = None
+            return
+        last_state = states[line - 1 + removed]
+        states[line - 1:line + removed] = array("b", [-1] * added + [last_state])
+        self._dirty.splice(line, removed, added)
+        self._dirty.add(line, line + added + 1)
+        self._painted.splice(line, removed, added)
+        self._painted.remove(line, line + added + 1)
+
+    def highlight_pending(self):
+        """未処理の行の解析をワーカーに依頼する（表示中の行が優先される）"""
+        self._request()
+
+    def highlight_visible(self):
+        """スクロール時に呼ばれ、表示範囲に未処理の行があれば解析を依頼する"""
+        if not self._dirty: return
+        if self._unpainted_visible(*self._visible_lines()):
+            self._request()
+
+    def cancel(self):
+        """以降の解析結果を適用しないようにする"""
+        self._closed = True
+        self._generation += 1
+        if self._poll_job is not None:
+            self.textbox.after_cancel(self._poll_job)
+            self._poll_job = None
+
+    def _request(self):
+        if self._inflight or self._closed or not self._dirty or self.grammar is None:
+            return
+        first, last = self._visible_lines()
+        visible = self._unpainted_visible(first, last)
+        provisional = False
+        if visible:
+            start, end = visible[0]
+            limit = last + 1
+            # 手前の行の状態が未確定なら仮の状態で塗り、後で埋め直す
+            provisional = start > 1 and self._dirty.contains(start - 1)
+        else:
+            start, end = self._dirty.first()
+            limit = start + self.FILL_SLICE_LINES
+        last_line = len(self._line_states)
+        stop = min(end if provisional else end + self.LOOKAHEAD_LINES, limit, last_line + 1)
+        if stop <= start: stop = start + 1
+
+        state = self._line_states[start - 2] if start > 1 else 0
+        if state < 0: state = 0
+        text = self.textbox.get(f"{start}.0", f"{stop - 1}.end")
+        generation = self._generation
+        grammar = self.grammar
+        self._inflight = True
+
+        def job():
+            try:
+                line_spans, line_states = grammar.tokenize(text, state)
+            except Exception as e:
+                print(f"トークナイズエラー: {e}")
+                self._results.put(None)
+                return
+            self._results.put((generation, start, end, provisional, line_spans, line_states))
+        _TokenizerWorker.submit(job)
+        self._poll_job = self.textbox.after(self.RESULT_POLL_MS, self._poll_result)
+
+    def _poll_result(self):
+        """UI スレッドでワーカーの解析結果を受け取る。まだ届いていなければ少し待って取り直す"""
+        try:
+            result = self._results.get_nowait()
+        except queue.Empty:
+            self._poll_job = self.textbox.after(self.RESULT_POLL_MS, self._poll_result)
+            return
+        self._poll_job = None
+        if result is None:
+            # 解析に失敗した。範囲は未処理のまま残し、次の編集やスクロールで解析し直す
+            self._inflight = False
+            return
+        self._apply_result(result)
+
+    def _apply_result(self, result):
+        """メインスレッドで解析結果を適用する。世代が古ければ捨てて取り直す"""
+        self._inflight = False
+        generation, start, end, provisional, line_spans, line_states = result
+        if self._closed: return
+        if generation != self._generation:
+            self._request()
+            return
+
+        states = self._line_states
+        line = start
+        settled = False
+        for new_state in line_states:
+            line += 1
+            if provisional: continue
+            old_state = states[line - 2]
+            states[line - 2] = new_state
+            if line >= end and new_state == old_state:
+                settled = True
+                break
+
+        self._apply_spans(start, line_spans[:line - start])
+
+        if provisional:
+            # 後で正しい状態から埋め直すまで、同じ範囲を再度優先しないよう記録する
+            self._painted.add(start, line)
+        else:
+            self._dirty.remove(start, line)
+            self._painted.remove(start, line)
+            if not settled and line <= len(states):
+                # 状態の変化が続いている場合は次の行から続きを処理する
+                self._dirty.add(line, line + 1)
+        self._request()
+
+    def _apply_spans(self, start, line_spans):
+        """start 行から始まる各行のスパンを、タグごとに1回の tag add でまとめて適用する"""
+        widget = self.textbox._textbox
+        end = start + len(line_spans)
+        ranges = {tag: [] for tag in AppConfig.SYNTAX.keys()}
+        for line, spans in enumerate(line_spans, start):
+            prefix = f"{line}."
+            for tag, s, e in spans:
+                # "1.0+Nc" のような相対指定は Tk 側で先頭から数え直すため、行.列 を直接渡す
+                ranges[tag] += (prefix + str(s), prefix + str(e))
+        for tag, indices in ranges.items():
+            widget.tag_remove(tag, f"{start}.0", f"{end}.0")
+            if indices:
+                widget.tag_add(tag, *indices)
+
+    def _unpainted_visible(self, first, last):
+        """表示範囲内で、まだ一度も塗られていない未処理の行範囲"""
+        pending = _LineRanges()
+        for start, end in self._dirty.clip(first, last + 1):
+            pending.add(start, end)
+        for start, end in self._painted.ranges:
+            pending.remove(start, end)
+        return pending.ranges
+
+    def _visible_lines(self):
+        widget = self.textbox._textbox
+        first = int(widget.index("@0,0").split(".")[0])
+        last = int(widget.index(f"@0,{widget.winfo_height()}").split(".")[0])
+        return first, last
+
+    def _line_count(self):
+        return int(self.textbox.index("end-1c").split(".")[0])
 
     def clear_syntax(self):
         for tag in AppConfig.SYNTAX.keys():
@@ -76,14 +298,88 @@ class SyntaxHighlighter:
 # ==========================================
 # 4. エディタコンポーネント (EditorView)
 # ==========================================
+class DocumentStats:
+    """文字数・行数・単語数。編集で影響を受けた行の前後の差分だけで更新する"""
+    def __init__(self, text=""):
+        self.recount(text)
+
+    def recount(self, text):
+        self.chars = len(text)
+        self.lines = text.count("\n") + 1
+        self.words = len(text.split())
+
+    def update(self, old, new):
+        """old (編集前の影響行) が new に置き換わった分を反映する"""
+        self.chars += len(new) - len(old)
+        self.lines += new.count("\n") - old.count("\n")
+        self.words += len(new.split()) - len(old.split())
+
+
+class FrameScheduler:
+    """画面更新を dirty フラグとして溜め、1フレームに1回だけまとめて実行する
+
+    優先度の小さい段から実行し、後の段はアイドル時まで遅らせる。
+    キーリピート中に同じ更新が何度も積み重なることはない。
+    """
+    FRAME_MS = 16
+
+    def __init__(self, widget):
+        self.widget = widget
+        self._tasks = {}
+        self._pending = set()
+        self._job = None
+
+    def register(self, name, callback, priority):
+        self._tasks[name] = (priority, callback)
+
+    def mark(self, *names):
+        self._pending.update(names)
+        if self._job is None:
+            self._job = self.widget.after(self.FRAME_MS, self._run_frame)
+
+    def _run_frame(self):
+        self._job = None
+        if not self._pending: return
+        tiers = sorted({self._tasks[name][0] for name in self._pending})
+        self._run_tier(tiers[0])
+        if len(tiers) > 1:
+            # 残りの段は溜まった入力イベントを先に処理させてから実行する
+            self._job = self.widget.after_idle(self._run_frame)
+
+    def _run_tier(self, priority):
+        names = [name for name in self._pending if self._tasks[name][0] == priority]
+        for name in names:
+            self._pending.discard(name)
+        for name in names:
+            self._tasks[name][1]()
+
+    def cancel(self):
+        if self._job is not None:
+            self.widget.after_cancel(self._job)
+            self._job = None
+        self._pending.clear()
+
+
 class EditorView(ctk.CTkFrame):
-    def __init__(self, master, content="", file_path=None, on_change_callback=None, on_cursor_callback=None, **kwargs):
+    def __init__(self, master, content="", file_path=None, on_change_callback=None, on_cursor_callback=None, on_view_callback=None, on_edit_callback=None, **kwargs):
         super().__init__(master, fg_color=AppConfig.COLORS["editor_bg"], corner_radius=0)
         
         self.file_path = file_path
         self.is_modified = False
         self.on_change_callback = on_change_callback
         self.on_cursor_callback = on_cursor_callback
+        self.on_view_callback = on_view_callback
+        # on_edit_callback(行, 列, 終了行, 終了列, 文字列) は編集の直前に呼ばれる (復旧ジャーナル用)
+        self.on_edit_callback = on_edit_callback
+        # 内容が変わるたびに増える版数 (検索索引などのキャッシュキーに使う)
+        self.version = 0
+        # 保存時に元のファイルと同じ形式で書き出すためのエンコーディングと改行 (None は OS の既定)
+        self.encoding = "utf-8"
+        self.newline = None
+        # 巨大ファイルビューで、ウィンドウの1行目がファイルの何行目にあたるか (行番号の表示用)
+        self.line_offset = 0
+        # スクロールバーに渡す位置 (first, last) を変換する関数。巨大ファイルビューがファイル全体の位置に直す
+        self.yscroll_filter = None
         self.mode = self._detect_mode(file_path)
 
         # 行番号キャンバス
@@ -104,15 +400,25 @@ class EditorView(ctk.CTkFrame):
 
         if AppConfig.settings["show_line_numbers"] or AppConfig.settings["show_grid"]:
             self.line_num_canvas.pack(side="left", fill="y", padx=(0, 0), before=self.textbox)
+        self._reset_gutter()
 
         self.highlighter = SyntaxHighlighter(self.textbox)
+        # 更新処理の優先度: 0=カーソル・現在行, 1=行番号, 2=シンタックス・ステータスバー
+        self.scheduler = FrameScheduler(self)
+        self.scheduler.register("current_line", self.highlight_current_line, 0)
+        self.scheduler.register("gutter", self.update_line_numbers, 1)
+        self.scheduler.register("syntax", self.apply_highlight, 2)
+        self.scheduler.register("status", self._notify_cursor, 2)
+        self.scheduler.register("view", self._notify_view, 2)
+        self.stats = DocumentStats()
+        self._install_edit_hook()
         self.textbox.insert("0.0", content)
 
         # イベント
         self.textbox.bind("<KeyRelease>", self._handle_event)
         self.textbox.bind("<ButtonRelease-1>", self._handle_event)
         # 画面リサイズ等のタイミングでも行番号を更新
-        self.textbox._textbox.bind("<Configure>", lambda e: self.after(10, self.update_line_numbers))
+        self.textbox._textbox.bind("<Configure>", lambda e: self.scheduler.mark("gutter"))
         
         self.line_num_canvas.bind("<MouseWheel>", self._on_canvas_wheel)
 
@@ -120,7 +426,82 @@ class EditorView(ctk.CTkFrame):
         self.apply_highlight()
         self.highlight_current_line()
 
+    def _install_edit_hook(self):
+        """テキストウィジェットの insert/delete/replace を横取りして変更行を記録する"""
+        widget = self.textbox._textbox
+        self._widget_cmd = str(widget)
+        self._orig_cmd = f"{self._widget_cmd}_orig"
+        self._before_edit_cmd = widget.register(self._before_edit)
+        widget.tk.call("rename", self._widget_cmd, self._orig_cmd)
+        # 編集系以外のコマンドは Tcl 内で素通しするため、通常の描画コストは増えない
+        widget.tk.call("proc", self._widget_cmd, "cmd args", f"""
+            if {{$cmd in {{insert delete replace}}}} {{
+                {self._before_edit_cmd} $cmd {{*}}$args
+            }}
+            tailcall {{{self._orig_cmd}}} $cmd {{*}}$args
+        """)
+
+    def _remove_edit_hook(self):
+        widget = self.textbox._textbox
+        try:
+            widget.tk.call("rename", self._widget_cmd, "")
+            widget.tk.call("rename", self._orig_cmd, self._widget_cmd)
+        except Exception:
+            pass
+
+    def _before_edit(self, cmd, *args):
+        """編集の直前に呼ばれ、「範囲 [start, end) を text に置き換える」形に正規化して通知する"""
+        try:
+            tk, orig = self.textbox._textbox.tk, self._orig_cmd
+            if str(tk.call(orig, "cget", "-state")) != "normal": return
+            if cmd == "insert":
+                index = str(tk.call(orig, "index", args[0]))
+                if tk.call(orig, "compare", index, "==", "end"):
+                    index = str(tk.call(orig, "index", "end-1c"))
+                self._on_edit(index, index, "".join(str(chars) for chars in args[1::2]))
+                return
+
+            if cmd == "replace":
+                pairs, text = [args[:2]], "".join(str(chars) for chars in args[2::2])
+            else:
+                pairs, text = [args[i:i + 2] for i in range(0, len(args), 2)], ""
+            ranges = []
+            for pair in pairs:
+                first = str(tk.call(orig, "index", pair[0]))
+                last = str(tk.call(orig, "index", pair[1] if len(pair) > 1 else f"{first}+1c"))
+                if tk.call(orig, "compare", last, ">", "end-1c"):
+                    last = str(tk.call(orig, "index", "end-1c"))
+                if tk.call(orig, "compare", last, ">=", first):
+                    ranges.append((first, last))
+            # 後ろの範囲から通知して位置のずれを防ぐ
+            for first, last in sorted(ranges, key=lambda r: tuple(map(int, r[0].split("."))), reverse=True):
+                self._on_edit(first, last, text)
+        except Exception:
+            # 不正なインデックス等は元のコマンド側でエラーになるので、ここでは何もしない
+            pass
+
+    def _on_edit(self, start, end, text):
+        """start から end までが text に置き換わる直前に呼ばれる"""
+        line, col = map(int, start.split("."))
+        end_line, end_col = map(int, end.split("."))
+        # 影響する行全体の編集前後のテキストから統計を差分更新する
+        old = str(self.textbox._textbox.tk.call(self._orig_cmd, "get", f"{line}.0", f"{end_line}.end"))
+        end_offset = old.rfind("\n") + 1 + end_col if end_line > line else end_col
+        self.stats.update(old, old[:col] + text + old[end_offset:])
+        self.version += 1
+        if self.on_edit_callback: self.on_edit_callback(line, col, end_line, end_col, text)
+
+        self.highlighter.note_edit(line, end_line - line, text.count("\n"))
+        self.scheduler.mark("gutter", "syntax")
+
+    def destroy(self):
+        self.scheduler.cancel()
+        self.highlighter.cancel()
+        self._remove_edit_hook()
+        super().destroy()
+
     def _on_scroll_sync(self, *args):
+        if self.yscroll_filter: args = self.yscroll_filter(*args)
         if self.original_yscroll:
             if callable(self.original_yscroll):
                 self.original_yscroll(*args)
@@ -129,17 +510,14 @@ class EditorView(ctk.CTkFrame):
                     self.textbox._textbox.tk.call(self.original_yscroll, *args)
                 except:
                     pass
-        self.update_line_numbers()
+        self.scheduler.mark("gutter", "view")
+        self.highlighter.highlight_visible()
 
     def _on_canvas_wheel(self, event):
         self.textbox._textbox.yview_scroll(int(-1*(event.delta/120)), "units")
-        self.update_line_numbers()
 
     def _detect_mode(self, path):
-        if not path: return "Plain Text"
-        ext = os.path.splitext(path)[1].lower()
-        mapping = {".py": "Python", ".html": "HTML", ".css": "CSS", ".js": "JavaScript", ".md": "Markdown"}
-        return mapping.get(ext, "Plain Text")
+        return mode_for_path(path)
 
     def toggle_line_numbers(self, show):
         if show or AppConfig.settings["show_grid"]:
@@ -169,58 +547,188 @@ class EditorView(ctk.CTkFrame):
             self.textbox.tag_add("current_line", line_start, line_end)
 
     def update_line_numbers(self):
-        self.line_num_canvas.delete("all")
-        if not AppConfig.settings["show_line_numbers"] and not AppConfig.settings["show_grid"]:
+        """行番号と罫線を描画する。表示位置や行数が変わらなければ何もしない"""
+        show_nums = AppConfig.settings["show_line_numbers"]
+        show_grid = AppConfig.settings["show_grid"]
+        if not show_nums and not show_grid:
+            self._reset_gutter()
             return
 
-        i = self.textbox.index("@0,0")
+        widget = self.textbox._textbox
+        first = widget.index("@0,0")
+        first_info = widget.dlineinfo(first)
         mode = ctk.get_appearance_mode()
+        font = AppConfig.get_editor_font()
+        key = (first, first_info[1] if first_info else None, first_info[3] if first_info else None,
+               widget.index(f"@0,{widget.winfo_height()}"), widget.index("end-1c").split(".")[0],
+               self.winfo_height(), show_nums, show_grid, mode, font, self.line_offset)
+        if key == self._gutter_key: return
+        if (mode, font) != self._gutter_style:
+            # 色やフォントが変わった時だけアイテムを作り直す
+            self._reset_gutter()
+            self._gutter_style = (mode, font)
+        self._gutter_key = key
+
+        canvas = self.line_num_canvas
         grid_color = AppConfig.COLORS["grid_line"][1] if mode=="Dark" else AppConfig.COLORS["grid_line"][0]
-        
+
         # 垂直境界線
-        if AppConfig.settings["show_grid"]:
-            self.line_num_canvas.create_line(54, 0, 54, self.winfo_height(), fill=grid_color)
+        if self._gutter_border is None:
+            self._gutter_border = canvas.create_line(54, 0, 54, 0, fill=grid_color)
+        canvas.coords(self._gutter_border, 54, 0, 54, self.winfo_height())
+        canvas.itemconfigure(self._gutter_border, state="normal" if show_grid else "hidden")
 
-        while True:
-            dline = self.textbox._textbox.dlineinfo(i)
-            if dline is None: break
-            
-            # y=座標, h=行の高さ
-            y = dline[1]
-            h = dline[3]
-            
-            # 行番号の描画
-            if AppConfig.settings["show_line_numbers"]:
-                line_num = str(i).split(".")[0]
-                # x=27.5 (幅55の中央), anchor="center" で中央寄せ
-                self.line_num_canvas.create_text(27, y + (h/2) + 5, anchor="center", text=line_num, 
-                                                 fill=AppConfig.COLORS["line_num_fg"], font=AppConfig.get_editor_font())
-            
-            # 水平罫線の描画
-            if AppConfig.settings["show_grid"]:
-                self.line_num_canvas.create_line(0, y + h + 5, 55, y + h + 5, fill=grid_color)
-
-            i = self.textbox.index(f"{i}+1line")
+        # 表示中の各行の y=座標, h=行の高さ を集める
+        rows = []
+        i = first
+        dline = first_info
+        while dline is not None:
+            rows.append((str(int(str(i).split(".")[0]) + self.line_offset), dline[1], dline[3]))
+            i = widget.index(f"{i}+1line")
+            dline = widget.dlineinfo(i)
+
+        for n, (line_num, y, h) in enumerate(rows):
+            # 行番号: 使い回しのテキストアイテムを移動して書き換える (x=27 は幅55の中央)
+            if n == len(self._gutter_nums):
+                self._gutter_nums.append(canvas.create_text(27, 0, anchor="center", text="",
+                                                            fill=AppConfig.COLORS["line_num_fg"], font=font))
+                self._gutter_rules.append(canvas.create_line(0, 0, 55, 0, fill=grid_color))
+                self._gutter_labels.append(None)
+            canvas.coords(self._gutter_nums[n], 27, y + (h/2) + 5)
+            label = line_num if show_nums else ""
+            if self._gutter_labels[n] != label:
+                canvas.itemconfigure(self._gutter_nums[n], text=label)
+                self._gutter_labels[n] = label
+            # 水平罫線
+            canvas.coords(self._gutter_rules[n], 0, y + h + 5, 55, y + h + 5)
+            canvas.itemconfigure(self._gutter_rules[n], state="normal" if show_grid else "hidden")
+
+        # 余ったアイテムは隠しておく
+        for n in range(len(rows), self._gutter_shown):
+            canvas.itemconfigure(self._gutter_nums[n], text="")
+            canvas.itemconfigure(self._gutter_rules[n], state="hidden")
+            self._gutter_labels[n] = ""
+        self._gutter_shown = len(rows)
+
+    def _reset_gutter(self):
+        self.line_num_canvas.delete("all")
+        self._gutter_nums = []
+        self._gutter_rules = []
+        self._gutter_labels = []
+        self._gutter_border = None
+        self._gutter_shown = 0
+        self._gutter_key = None
+        self._gutter_style = None
 
     def _handle_event(self, event=None):
-        if event and event.keysym in ("Up", "Down", "Left", "Right", "Page_Up", "Page_Down", "Return", "BackSpace"):
-            self.update_line_numbers()
-            self.highlight_current_line()
-            if self.on_cursor_callback: self.on_cursor_callback()
-            return
+        is_navigation = event and event.keysym in ("Up", "Down", "Left", "Right", "Page_Up", "Page_Down", "Return", "BackSpace")
+        # 読み取り専用 (state="disabled") のときはキー入力があっても内容は変わらない
+        editable = str(self.textbox._textbox.cget("state")) == "normal"
+        if not is_navigation and not self.is_modified and event and event.char and editable:
+            self.is_modified = True
+            if self.on_change_callback: self.on_change_callback()
 
-        if not self.is_modified and event and event.char:
+        # 実際の再描画は次のフレームでまとめて行う
+        self.scheduler.mark("current_line", "gutter", "syntax", "status")
+
+    def replace_range(self, start, end, text):
+        """start から end までを text に置き換える。1回の編集として扱い、取り消しも1回で戻る"""
+        widget = self.textbox._textbox
+        widget.configure(autoseparators=False)
+        try:
+            widget.edit_separator()
+            widget.replace(start, end, text)
+            widget.edit_separator()
+        finally:
+            widget.configure(autoseparators=True)
+        if not self.is_modified:
             self.is_modified = True
             if self.on_change_callback: self.on_change_callback()
-        
-        self.update_line_numbers()
-        self.apply_highlight()
-        self.highlight_current_line()
+        self.scheduler.mark("current_line", "gutter", "syntax", "status")
+
+    def selection_length(self):
+        """選択中の文字数 (選択がなければ 0)"""
+        try:
+            count = self.textbox._textbox.count("sel.first", "sel.last", "chars")
+        except Exception:
+            return 0
+        if isinstance(count, tuple): count = count[0]
+        return count or 0
+
+    def _notify_cursor(self):
         if self.on_cursor_callback: self.on_cursor_callback()
 
+    def _notify_view(self):
+        if self.on_view_callback: self.on_view_callback()
+
+    def visible_lines(self):
+        """画面に表示されている (先頭行, 末尾行)"""
+        return self.highlighter._visible_lines()
+
     def get(self, *args, **kwargs): return self.textbox.get(*args, **kwargs)
     def insert(self, *args, **kwargs): return self.textbox.insert(*args, **kwargs)
     def index(self, *args, **kwargs): return self.textbox.index(*args, **kwargs)
     def see(self, *args, **kwargs): return self.textbox.see(*args, **kwargs)
     def focus_set(self): self.textbox.focus_set()
     def reset_modified(self): self.is_modified = False
+
+
+# ==========================================
+# 5. 検索結果パネル (SearchResultsPanel)
+# ==========================================
+class SearchResultsPanel(ctk.CTkFrame):
+    """複数ファイル・複数タブの検索結果の一覧
+
+    結果は届いた分から append で追加する。行数が多くても軽いよう tk の Listbox を使い、
+    各行に対応する payload をクリック時に on_select へ渡す。
+    """
+    def __init__(self, master, on_select, on_close, **kwargs):
+        super().__init__(master, fg_color=AppConfig.COLORS["toolbar_bg"], corner_radius=0, border_width=1, border_color="gray50", **kwargs)
+        self.on_select = on_select
+        self._payloads = []
+
+        header = ctk.CTkFrame(self, fg_color="transparent", height=28)
+        header.pack(side="top", fill="x", padx=5, pady=(3, 0))
+        self.title_label = ctk.CTkLabel(header, text="", anchor="w", font=AppConfig.get_ui_font(True))
+        self.title_label.pack(side="left")
+        self.status_label = ctk.CTkLabel(header, text="", anchor="w", text_color=AppConfig.COLORS["text_secondary"])
+        self.status_label.pack(side="left", padx=10)
+        ctk.CTkButton(header, text="×", width=25, height=24, fg_color="transparent", hover_color="#AA3333", command=on_close).pack(side="right")
+
+        body = ctk.CTkFrame(self, fg_color="transparent")
+        body.pack(side="top", fill="both", expand=True, padx=5, pady=5)
+        self.listbox = Listbox(body, activestyle="none", highlightthickness=0, bd=0, font=AppConfig.get_editor_font())
+        scrollbar = ctk.CTkScrollbar(body, command=self.listbox.yview)
+        self.listbox.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.listbox.pack(side="left", fill="both", expand=True)
+        self.listbox.bind("<<ListboxSelect>>", self._on_listbox_select)
+        self.update_appearance()
+
+    def clear(self, title=""):
+        self.listbox.delete(0, "end")
+        self._payloads = []
+        self.title_label.configure(text=title)
+        self.status_label.configure(text="")
+
+    def append(self, rows):
+        """rows: [(表示文字列, payload), ...] をまとめて追加する"""
+        if not rows: return
+        self.listbox.insert("end", *[label for label, _ in rows])
+        self._payloads.extend(payload for _, payload in rows)
+
+    def set_status(self, text):
+        self.status_label.configure(text=text)
+
+    def __len__(self):
+        return len(self._payloads)
+
+    def _on_listbox_select(self, event=None):
+        selection = self.listbox.curselection()
+        if selection: self.on_select(self._payloads[selection[0]])
+
+    def update_appearance(self):
+        dark = ctk.get_appearance_mode() == "Dark"
+        bg = AppConfig.COLORS["editor_bg"][1 if dark else 0]
+        fg = AppConfig.COLORS["text_active"][1 if dark else 0]
+        self.listbox.configure(bg=bg, fg=fg, font=AppConfig.get_editor_font())